@@ -0,0 +1,118 @@
+""" Incrementally maintained inventory totals
+
+    totals = InventoryTotals()      ## one scan of Item.all, then O(1) per change
+    totals.total_value
+    totals.by_class(Phone)
+
+Follows the registry through `Item.observe`, so construction, discounts,
+increments and quantity writes keep the numbers current.
+"""
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from item import Item
+from registry import WeakRegistry
+
+
+class _CountedRef(weakref.ref):
+    """ weak reference to a counted item, carrying what it adds to the totals """
+    __slots__ = ('key', 'cls', 'value', 'quantity')
+
+
+class InventoryTotals:
+    """
+    totals of one registry (default `Item.all`, or an `ItemScope` / `WeakRegistry`):
+    only items added to that registry are counted, and only their changes.
+
+    a strong registry keeps its items alive until `item_removed`, so only their
+    ids are kept. members of a WeakRegistry are held through a weak reference
+    carrying their last values, subtracted when the item is collected.
+    """
+    def __init__(self, items: Optional[Iterable[Item]] = None) -> None:
+        self._items = Item.all if items is None else items
+        self._weak = isinstance(self._items, WeakRegistry)
+        self.rebuild()
+        Item.observe(self)
+
+    def close(self) -> None:
+        Item.unobserve(self)
+
+    def rebuild(self) -> None:
+        ''' recompute from scratch (clears rounding drift of long running sums) '''
+        self.total_value = 0.0
+        self.total_quantity = 0
+        self.count = 0
+        ## class -> [value, quantity, count]
+        self._classes: Dict[type, List] = {}
+        ## ids of the counted items: a set, or id -> _CountedRef for a WeakRegistry
+        self._members = {} if self._weak else set()
+        for item in list(self._items):
+            self._track(item)
+
+    def by_class(self, cls: type) -> Tuple[float, int]:
+        ''' (value, quantity) of the items whose exact class is `cls` '''
+        value, quantity, _ = self._classes.get(cls, (0.0, 0, 0))
+        return value, quantity
+
+    def per_class(self) -> Dict[str, Dict]:
+        return {cls.__name__: {'value': value, 'quantity': quantity, 'count': count}
+                for cls, (value, quantity, count) in self._classes.items()}
+
+    def _track(self, item: Item) -> None:
+        key = id(item)
+        if key in self._members:
+            return
+        value, quantity = item.price * item.quantity, item.quantity
+        if self._weak:
+            ref = self._members[key] = _CountedRef(item, self._collected)
+            ref.key, ref.cls, ref.value, ref.quantity = key, type(item), value, quantity
+        else:
+            self._members.add(key)
+        self._update(type(item), value, quantity, 1)
+
+    def _collected(self, ref: _CountedRef) -> None:
+        if self._members.get(ref.key) is ref:
+            del self._members[ref.key]
+            self._update(ref.cls, -ref.value, -ref.quantity, -1)
+
+    ## observer protocol
+    def item_added(self, item: Item) -> None:
+        if Item.registry() is self._items:
+            self._track(item)
+
+    def item_removed(self, item: Item) -> None:
+        key = id(item)
+        if self._weak:
+            ref = self._members.pop(key, None)
+            if ref is not None:
+                self._update(ref.cls, -ref.value, -ref.quantity, -1)
+        elif key in self._members:
+            self._members.discard(key)
+            self._update(type(item), -item.price * item.quantity, -item.quantity, -1)
+
+    def item_changed(self, item: Item, field: str, old, new) -> None:
+        if id(item) not in self._members:
+            return
+        if field == 'price':
+            value, quantity = (new - old) * item.quantity, 0
+        elif field == 'quantity':
+            value, quantity = item.price * (new - old), new - old
+        else:
+            return
+        if self._weak:
+            ref = self._members[id(item)]
+            ref.value += value
+            ref.quantity += quantity
+        self._update(type(item), value, quantity, 0)
+
+    def _update(self, cls: type, value: float, quantity: int, count: int) -> None:
+        self.total_value += value
+        self.total_quantity += quantity
+        self.count += count
+
+        totals = self._classes.get(cls)
+        if totals is None:
+            totals = self._classes[cls] = [0.0, 0, 0]
+        totals[0] += value
+        totals[1] += quantity
+        totals[2] += count
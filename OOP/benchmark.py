@@ -0,0 +1,510 @@
+""" Benchmarks for the inventory model
+
+    python benchmark.py <name> [--rows N]
+    python benchmark.py memory --rows 10000000
+    python benchmark.py soak --rows 100000 --seconds 86400
+
+    python benchmark.py suite --save results.json
+    python benchmark.py suite --sizes 1000,100000 --baseline results.json   ## exits 1 on a regression
+"""
+import argparse
+import json
+import operator
+import os
+import random
+import resource
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Tuple
+
+from item import Item
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def make_csv(path: str, rows: int, seed: int = 0) -> None:
+    ''' writes an items.csv-like file with `rows` random rows '''
+    rnd = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write('name,price,quantity\n')
+        for _ in range(rows):
+            name = ''.join(rnd.choices(string.ascii_letters, k=8))
+            f.write(f"'{name}',{rnd.randint(1, 1000)},{rnd.randint(0, 50)}\n")
+
+
+@benchmark
+def csv_scaling(args) -> None:
+    ''' sharded parallel loading against the single core streaming loader '''
+    from parallel_loader import read_csv_parallel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'items.csv')
+        make_csv(path, args.rows)
+
+        Item.all.clear()
+        print(f"{'streaming':>12}: {Item.read_from_csv(path, positional=True)}")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            Item.all.clear()
+            print(f"{workers:>3} workers : {read_csv_parallel(path, workers=workers)}")
+            workers *= 2
+        Item.all.clear()
+
+
+class _DictItem:
+    ''' the pre-__slots__ layout of Item, for comparison only '''
+    def __init__(self, name: str, price: float, quantity: int) -> None:
+        self._Item__name = name
+        self._Item__price = price
+        self._Item__quantity = quantity
+
+
+def bytes_per_instance(factory, n: int) -> float:
+    registry = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        registry.append(factory('MyItem', float(i), i))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / n
+
+
+@benchmark
+def memory(args) -> None:
+    ''' bytes per instance, slotted Item / Phone against a per-instance __dict__ '''
+    from phone import Phone
+
+    ## keep the shared registry out of the measurement
+    all_items, Item.all = Item.all, []
+    try:
+        n = 100_000
+        while n <= args.rows:
+            Item.all = []
+            results = {'dict': bytes_per_instance(_DictItem, n)}
+            Item.all = []
+            results['Item'] = bytes_per_instance(Item, n)
+            Item.all = []
+            results['Phone'] = bytes_per_instance(Phone, n)
+            print(f"{n:>10,}: " + ", ".join(f"{k} {v:.1f} B" for k, v in results.items()))
+            n *= 10
+    finally:
+        Item.all = all_items
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+@benchmark
+def indexes(args) -> None:
+    ''' name and price / quantity range lookups, ItemIndex against a scan of Item.all '''
+    from index import ItemIndex
+
+    rnd = random.Random(0)
+    Item.all.clear()
+    for i in range(args.rows):
+        Item(f"item{i}", rnd.randint(1, 10_000), rnd.randint(0, 100))
+
+    start = time.perf_counter()
+    index = ItemIndex()
+    print(f"build index : {time.perf_counter() - start:.3f}s for {args.rows:,} items")
+
+    name = f"item{args.rows // 2}"
+    cases = {
+        'by name': (lambda: index.by_name(name),
+                    lambda: [i for i in Item.all if i.name == name]),
+        'price band': (lambda: index.price_range(5_000, 5_010),
+                       lambda: [i for i in Item.all if 5_000 <= i.price <= 5_010]),
+        'quantity band': (lambda: index.quantity_range(42, 42),
+                          lambda: [i for i in Item.all if 42 <= i.quantity <= 42]),
+    }
+    for case, (indexed, scan) in cases.items():
+        t_index, t_scan = timed(indexed, 100), timed(scan, 3)
+        print(f"{case:>14}: index {t_index * 1e6:10.1f} us, scan {t_scan * 1e6:12.1f} us "
+              f"({t_scan / t_index:,.0f}x)")
+
+    index.close()
+    Item.all.clear()
+
+
+@benchmark
+def soak(args) -> None:
+    ''' batches created in an ItemScope and dropped, again and again; memory must stay flat '''
+    from registry import ItemScope
+
+    tracemalloc.start()
+    deadline = time.perf_counter() + args.seconds
+    next_sample, batches, samples = 0.0, 0, []
+    while time.perf_counter() < deadline:
+        with ItemScope() as batch:
+            for i in range(args.rows):
+                Item('MyItem', float(i), i)
+        batch.drop()
+        batches += 1
+
+        if time.perf_counter() >= next_sample:
+            samples.append(tracemalloc.get_traced_memory()[0])
+            print(f"batch {batches:>6}: {samples[-1] / 1024:10.1f} KiB traced")
+            next_sample = time.perf_counter() + args.seconds / 20
+    tracemalloc.stop()
+
+    print(f"{batches} batches of {args.rows:,} items, growth {(samples[-1] - samples[0]) / 1024:.1f} KiB, "
+          f"global registry size {len(Item.all)}")
+
+
+@benchmark
+def snapshot(args) -> None:
+    ''' cold start: parse the CSV against mapping a binary snapshot '''
+    from snapshot import load_snapshot, save_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, snap_path = os.path.join(tmp, 'items.csv'), os.path.join(tmp, 'items.snap')
+        make_csv(csv_path, args.rows)
+
+        Item.all.clear()
+        print(f"csv load          : {Item.read_from_csv(csv_path, positional=True)}")
+        save_snapshot(snap_path)
+        Item.all.clear()
+
+        start = time.perf_counter()
+        with load_snapshot(snap_path) as snap:
+            mapped = time.perf_counter() - start
+            snap.price(len(snap) - 1)
+            print(f"snapshot map      : {mapped * 1e3:.3f} ms (read-only consumers stop here)")
+            snap.materialize()
+        print(f"snapshot + objects: {time.perf_counter() - start:.3f}s")
+        Item.all.clear()
+
+
+@benchmark
+def repricing(args) -> None:
+    ''' per-object apply_discount calls against one reprice() pass, objects and ItemStore '''
+    from phone import Phone
+    from repricing import reprice
+    from store import ItemStore
+
+    Item.all.clear()
+    for i in range(args.rows):
+        (Phone if i % 4 == 0 else Item)('MyItem', 100.0, i)
+
+    start = time.perf_counter()
+    for item in Item.all:
+        item.apply_discount()
+    print(f"method calls : {time.perf_counter() - start:.3f}s")
+    print(f"reprice      : {reprice(pay_rates={Phone: 0.8})}")
+
+    store = ItemStore.from_items()
+    print(f"store        : {reprice(store, pay_rates={Phone: 0.8})}")
+    Item.all.clear()
+
+
+@benchmark
+def mail(args) -> None:
+    ''' item notices through MailPipeline into a local stand-in SMTP server '''
+    import asyncio
+    from mailer import LocalSMTPServer, MailPipeline
+
+    items = [Item(f"item{i}", 10.0, i, register=False) for i in range(args.rows)]
+
+    async def run() -> None:
+        async with LocalSMTPServer() as server:
+            for connections in (1, 4, 16):
+                server.messages.clear()
+                pipeline = MailPipeline('127.0.0.1', server.port, 'shop@example.com',
+                                        ['ops@example.com'], connections=connections)
+                report = await pipeline.run(items)
+                print(f"{connections:>3} connections: {report}, server got {len(server.messages)}")
+
+    asyncio.run(run())
+
+
+@benchmark
+def records(args) -> None:
+    ''' Item.from_records against calling the constructor row by row '''
+    rows = [(f"item{i}", float(i % 1000), i % 50) for i in range(args.rows)]
+
+    Item.all.clear()
+    start = time.perf_counter()
+    for name, price, quantity in rows:
+        Item(name, price, quantity)
+    per_row = time.perf_counter() - start
+
+    Item.all.clear()
+    start = time.perf_counter()
+    Item.from_records(rows)
+    batch = time.perf_counter() - start
+    print(f"constructor {per_row:.3f}s, from_records {batch:.3f}s ({per_row / batch:.2f}x)")
+    Item.all.clear()
+
+
+@benchmark
+def formats(args) -> None:
+    ''' throughput and peak traced memory of the csv, jsonl and yaml loaders on the same rows '''
+    import json
+    from registry import ItemScope
+
+    rnd = random.Random(0)
+    rows = [(f"item{i}", rnd.randint(1, 1000), rnd.randint(0, 50)) for i in range(args.rows)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {fmt: os.path.join(tmp, f"items.{fmt}") for fmt in ('csv', 'jsonl', 'yaml')}
+        with open(paths['csv'], 'w') as f:
+            f.write('name,price,quantity\n')
+            f.writelines(f"{n},{p},{q}\n" for n, p, q in rows)
+        with open(paths['jsonl'], 'w') as f:
+            f.writelines(json.dumps({'name': n, 'price': p, 'quantity': q}) + '\n' for n, p, q in rows)
+        with open(paths['yaml'], 'w') as f:
+            f.writelines(f"---\nname: {n}\nprice: {p}\nquantity: {q}\n" for n, p, q in rows)
+
+        for fmt, path in paths.items():
+            ## every chunk is dropped once built, so the peak is the loader's own
+            with ItemScope() as scope:
+                tracemalloc.start()
+                stats = Item.load(path, on_batch=lambda items: scope.drop())
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print(f"{fmt:>6}: {stats}, peak {peak / 2 ** 20:.1f} MiB")
+
+
+@benchmark
+def journal(args) -> None:
+    ''' journal append throughput per group commit size, then recovery (snapshot + replay) '''
+    from journal import ItemJournal, replay
+    from snapshot import load_snapshot, save_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snap_path = os.path.join(tmp, 'items.snap')
+        Item.all.clear()
+        Item.from_records(_rows(args.rows))
+        save_snapshot(snap_path)
+
+        for group_size in (1, 100, 10_000):
+            journal_path = os.path.join(tmp, f"items{group_size}.journal")
+            appends = args.rows if group_size > 1 else min(args.rows, 10_000)
+            with ItemJournal(journal_path, group_size=group_size, group_interval=1.0):
+                start = time.perf_counter()
+                for item in Item.all[:appends]:
+                    item.quantity += 1
+                seconds = time.perf_counter() - start
+            print(f"group {group_size:>6}: {appends / seconds:12,.0f} appends/s")
+
+        start = time.perf_counter()
+        with load_snapshot(snap_path) as snap:
+            items = snap.materialize(register=False)
+        applied = replay(journal_path, items, register=False)
+        print(f"recovery    : {len(items):,} items + {applied:,} records in {time.perf_counter() - start:.3f}s")
+        Item.all.clear()
+
+
+def _worker_csv(path: str) -> Tuple[float, int]:
+    start = time.perf_counter()
+    Item.read_from_csv(path, positional=True)
+    total = sum(item.calculate_total_price() for item in Item.all)
+    return time.perf_counter() - start, _peak_rss_kib()
+
+
+def _worker_shared(name: str) -> Tuple[float, int]:
+    from shared_inventory import SharedInventory
+
+    start = time.perf_counter()
+    inventory = SharedInventory.attach(name)
+    total = sum(map(operator.mul, inventory.prices, inventory.quantities))
+    seconds = time.perf_counter() - start
+    inventory.close()
+    return seconds, _peak_rss_kib()
+
+
+@benchmark
+def shared(args) -> None:
+    ''' N workers loading their own registry against attaching to one shared inventory '''
+    from multiprocessing import Pool
+    from shared_inventory import SharedInventory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'items.csv')
+        make_csv(path, args.rows)
+        Item.all.clear()
+        Item.read_from_csv(path, positional=True)
+        inventory = SharedInventory.publish()
+        Item.all.clear()
+
+        try:
+            for label, worker, arg in (('per-process', _worker_csv, path),
+                                       ('shared', _worker_shared, inventory.name)):
+                with Pool(args.workers) as pool:
+                    results = pool.map(worker, [arg] * args.workers)
+                seconds = max(s for s, _ in results)
+                rss = sum(r for _, r in results)
+                print(f"{label:>12}: {args.workers} workers ready in {seconds:.3f}s, "
+                      f"summed peak RSS {rss / 1024:.1f} MiB")
+        finally:
+            inventory.close()
+            inventory.unlink()
+
+
+@benchmark
+def sqlite(args) -> None:
+    ''' SQLiteItemStore bulk load, point lookups and range scans against the in-memory registry '''
+    from index import ItemIndex
+    from sqlite_store import SQLiteItemStore
+
+    Item.all.clear()
+    Item.from_records(_rows(args.rows))
+    names = [f"item{i}" for i in random.Random(0).sample(range(args.rows), min(1000, args.rows))]
+
+    with tempfile.TemporaryDirectory() as tmp, SQLiteItemStore(os.path.join(tmp, 'items.db')) as store:
+        start = time.perf_counter()
+        store.upsert()
+        seconds = time.perf_counter() - start
+        print(f"bulk upsert : {args.rows / seconds:12,.0f} rows/s")
+
+        index = ItemIndex()
+        for label, lookup in (('sqlite', store.get), ('index', index.by_name)):
+            start = time.perf_counter()
+            for name in names:
+                lookup(name)
+            print(f"lookup {label:>6}: {len(names) / (time.perf_counter() - start):12,.0f} lookups/s")
+
+        for label, scan in (('sqlite', lambda: list(store.price_range(100, 110))),
+                            ('index', lambda: index.price_range(100, 110)),
+                            ('scan', lambda: [i for i in Item.all if 100 <= i.price <= 110])):
+            start = time.perf_counter()
+            found = scan()
+            print(f"range {label:>7}: {len(found):,} items in {(time.perf_counter() - start) * 1e3:.2f} ms")
+        index.close()
+    Item.all.clear()
+
+
+## hot paths of the suite : name -> (setup(n, tmp) -> state, run(state))
+def _rows(n: int) -> list:
+    return [(f"item{i}", float(i % 1000), i % 50) for i in range(n)]
+
+
+def _items(n: int, tmp: str) -> list:
+    return Item.from_records(_rows(n))
+
+
+def _csv(n: int, tmp: str) -> str:
+    path = os.path.join(tmp, f"items{n}.csv")
+    make_csv(path, n)
+    return path
+
+
+def _build_phones(rows: list) -> None:
+    from phone import Phone
+    for name, price, quantity in rows:
+        Phone(name, price, quantity)
+
+
+HOT_PATHS = {
+    'Item()': (lambda n, tmp: _rows(n),
+               lambda rows: [Item(name, price, quantity) for name, price, quantity in rows]),
+    'Phone()': (lambda n, tmp: _rows(n), _build_phones),
+    'read_from_csv': (_csv, Item.read_from_csv),
+    'apply_discount': (_items, lambda items: [item.apply_discount() for item in items]),
+    'calculate_total_price': (_items, lambda items: sum(item.calculate_total_price() for item in items)),
+    '__repr__': (_items, lambda items: [repr(item) for item in items]),
+}
+
+
+def _peak_rss_kib() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak    ## bytes on macOS, KiB elsewhere
+
+
+def measure(setup, run, n: int, tmp: str) -> dict:
+    ''' one untraced timed run, then one run under tracemalloc for allocations '''
+    state = setup(n, tmp)
+    Item.all.clear()
+    start = time.perf_counter()
+    run(state)
+    seconds = time.perf_counter() - start
+
+    Item.all.clear()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    run(state)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+    Item.all.clear()
+
+    return {'seconds': seconds, 'retained_bytes': retained, 'peak_traced_bytes': peak,
+            'live_blocks': blocks, 'peak_rss_kib': _peak_rss_kib()}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    ''' cases at least `threshold` (relative) slower than the baseline '''
+    regressions = []
+    for case, sizes in results.items():
+        for size, result in sizes.items():
+            before = baseline.get(case, {}).get(size)
+            if before and result['seconds'] > before['seconds'] * (1 + threshold):
+                regressions.append((case, size, before['seconds'], result['seconds']))
+    return regressions
+
+
+@benchmark
+def suite(args) -> None:
+    ''' construction, csv loading, discounts, totals and repr of the model at several sizes '''
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for case, (setup, run) in HOT_PATHS.items():
+            for n in sizes:
+                result = measure(setup, run, n, tmp)
+                results.setdefault(case, {})[str(n)] = result
+                print(f"{case:>22} {n:>10,}: {result['seconds']:9.4f}s "
+                      f"{result['retained_bytes'] / 2 ** 20:9.1f} MiB retained "
+                      f"{result['peak_traced_bytes'] / 2 ** 20:9.1f} MiB peak "
+                      f"rss {result['peak_rss_kib'] / 1024:8.1f} MiB")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version, 'results': results}, f, indent=2)
+        print(f"results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for case, size, before, after in regressions:
+            print(f"REGRESSION {case} at {size}: {before:.4f}s -> {after:.4f}s")
+        if regressions:
+            sys.exit(1)
+        print(f"no regression above {args.threshold:.0%} against {args.baseline}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seconds', type=float, default=60.0, help='duration of the soak run')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sizes', default='1000,100000,10000000', help='comma separated suite sizes')
+    parser.add_argument('--save', help='write suite results to this JSON file')
+    parser.add_argument('--baseline', help='suite results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown, 0.10 = 10%%')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    BENCHMARKS[args.name](args)
+    print(f"done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
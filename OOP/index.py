@@ -0,0 +1,148 @@
+""" Secondary indexes over the item registry
+
+    index = ItemIndex()                 ## indexes Item.all and follows every change
+    index.by_name('Mouse')              ## O(1)
+    index.price_range(10, 100)          ## O(log n + k)
+    index.quantity_range(0, 5)
+
+The index registers itself with `Item.observe`, so the name setter,
+`apply_discount`, `apply_increment` and quantity writes keep it consistent.
+It follows one registry (default `Item.all`): items added elsewhere, and
+their changes, are ignored. It holds strong references, so a `WeakRegistry`
+cannot be indexed.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional
+
+from item import Item
+from registry import WeakRegistry
+
+
+class SortedIndex:
+    """
+    items kept sorted by one numeric field.
+    keys are (value, id(item)) so every entry can be found again on update.
+    """
+    def __init__(self) -> None:
+        self._keys = []
+        self._items: Dict[int, Item] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, item: Item, value: float) -> None:
+        insort(self._keys, (value, id(item)))
+        self._items[id(item)] = item
+
+    def extend(self, pairs: Iterable) -> None:
+        '''
+        bulk load of (item, value) pairs with one sort instead of n inserts.
+        the keys already there form one sorted run, so timsort merges instead of re-sorting.
+        '''
+        for item, value in pairs:
+            self._keys.append((value, id(item)))
+            self._items[id(item)] = item
+        self._keys.sort()
+
+    def __contains__(self, item: Item) -> bool:
+        return self._items.get(id(item)) is item
+
+    def remove(self, item: Item, value: float) -> None:
+        key = (value, id(item))
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+            del self._items[id(item)]
+
+    def move(self, item: Item, old: float, new: float) -> None:
+        self.remove(item, old)
+        self.add(item, new)
+
+    def range(self, low: Optional[float] = None, high: Optional[float] = None) -> List[Item]:
+        ''' items with low <= value <= high, in ascending order '''
+        start = 0 if low is None else bisect_left(self._keys, (low,))
+        ## (high, inf) sorts after every (high, id) key
+        end = len(self._keys) if high is None else bisect_right(self._keys, (high, float('inf')))
+        items = self._items
+        return [items[key[1]] for key in self._keys[start:end]]
+
+
+class ItemIndex:
+    def __init__(self, items: Optional[Iterable[Item]] = None) -> None:
+        self._names: Dict[str, List[Item]] = {}
+        self._prices = SortedIndex()
+        self._quantities = SortedIndex()
+
+        if isinstance(items, WeakRegistry):
+            raise TypeError("an ItemIndex would keep every item of a WeakRegistry alive")
+        self._registry = Item.all if items is None else items
+
+        items = list(self._registry)
+        for item in items:
+            self._names.setdefault(item.name, []).append(item)
+        self._prices.extend((item, item.price) for item in items)
+        self._quantities.extend((item, item.quantity) for item in items)
+        Item.observe(self)
+
+    def close(self) -> None:
+        ''' stop following changes '''
+        Item.unobserve(self)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    ## queries
+    def by_name(self, name: str) -> List[Item]:
+        return list(self._names.get(name, ()))
+
+    def price_range(self, low: Optional[float] = None, high: Optional[float] = None) -> List[Item]:
+        return self._prices.range(low, high)
+
+    def quantity_range(self, low: Optional[int] = None, high: Optional[int] = None) -> List[Item]:
+        return self._quantities.range(low, high)
+
+    ## observer protocol
+    def item_added(self, item: Item) -> None:
+        if Item.registry() is not self._registry:
+            return
+        self._names.setdefault(item.name, []).append(item)
+        self._prices.add(item, item.price)
+        self._quantities.add(item, item.quantity)
+
+    def items_added(self, items: List[Item]) -> None:
+        ''' a whole batch: one merge per sorted index instead of an insort per item '''
+        if Item.registry() is not self._registry:
+            return
+        for item in items:
+            self._names.setdefault(item.name, []).append(item)
+        self._prices.extend((item, item.price) for item in items)
+        self._quantities.extend((item, item.quantity) for item in items)
+
+    def item_removed(self, item: Item) -> None:
+        if item not in self._prices:
+            return
+        self._drop_name(item, item.name)
+        self._prices.remove(item, item.price)
+        self._quantities.remove(item, item.quantity)
+
+    def item_changed(self, item: Item, field: str, old, new) -> None:
+        if item not in self._prices:
+            return
+        if field == 'name':
+            self._drop_name(item, old)
+            self._names.setdefault(new, []).append(item)
+        elif field == 'price':
+            self._prices.move(item, old, new)
+        elif field == 'quantity':
+            self._quantities.move(item, old, new)
+
+    def _drop_name(self, item: Item, name: str) -> None:
+        same_name = self._names.get(name)
+        if not same_name:
+            return
+        for i, other in enumerate(same_name):
+            if other is item:
+                del same_name[i]
+                break
+        if not same_name:
+            del self._names[name]
@@ -0,0 +1,179 @@
+""" Streaming ingestion helpers
+
+Rows are pulled lazily from the source and handed on in fixed size chunks,
+so only one chunk is alive at a time, whatever the size of the file.
+
+    source -> loader -> iter_chunks() -> Item.from_records() -> on_batch()
+
+Loaders are registered per format (csv, jsonl, yaml) with `register_loader`;
+`detect_format` picks one from the file extension or the first bytes.
+"""
+import csv
+import json
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+Source = Union[str, IO[str]]
+Row = Tuple[str, float, int]
+
+
+class LoadStats(namedtuple('LoadStats', ['rows', 'seconds'])):
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.rows} rows in {self.seconds:.3f}s ({self.rows_per_sec:,.0f} rows/s)"
+
+
+@contextmanager
+def open_source(source: Source):
+    ''' accepts either a path or an already opened file object '''
+    if isinstance(source, str):
+        with open(source, 'r', newline='') as f:
+            yield f
+    else:
+        yield source
+
+
+def parse_quantity(text: str) -> Union[int, float]:
+    '''
+    an int when the text holds a whole number ('3', '3.0'), otherwise the float,
+    so fractional quantities reach `Item.from_records` and are reported there.
+    '''
+    try:
+        return int(text)
+    except ValueError:
+        value = float(text)
+        return int(value) if value.is_integer() else value
+
+
+def _number(parse: Callable, text):
+    ''' `parse(text)`, or `text` itself when it is missing or not a number '''
+    try:
+        return parse(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def iter_rows(f: IO[str], positional: bool = False) -> Iterator[Row]:
+    '''
+    yields (name, price, quantity) tuples.
+    `positional` skips DictReader and reads the columns by their index in the header.
+    a value that is missing or not a number is passed on as it is (None / the text),
+    so `Item.from_records` reports the row with its position like any other bad row.
+    '''
+    if not positional:
+        for row in csv.DictReader(f):
+            yield (row.get('name'), _number(float, row.get('price')),
+                   _number(parse_quantity, row.get('quantity')))
+        return
+
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    name_at = header.index('name')
+    price_at = header.index('price')
+    quantity_at = header.index('quantity')
+    width = max(name_at, price_at, quantity_at) + 1
+
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row = row + [None] * (width - len(row))
+        yield row[name_at], _number(float, row[price_at]), _number(parse_quantity, row[quantity_at])
+
+
+## format name -> function(file) yielding rows
+LOADERS: Dict[str, Callable[[IO[str]], Iterator[Row]]] = {}
+EXTENSIONS: Dict[str, str] = {}
+
+
+def register_loader(name: str, *extensions: str):
+    def decorator(fn):
+        LOADERS[name] = fn
+        for extension in extensions:
+            EXTENSIONS[extension] = name
+        return fn
+    return decorator
+
+
+def _record(obj: dict) -> Row:
+    return obj.get('name'), obj.get('price'), obj.get('quantity')
+
+
+@register_loader('csv', '.csv')
+def read_csv(f: IO[str]) -> Iterator[Row]:
+    return iter_rows(f, positional=True)
+
+
+@register_loader('jsonl', '.jsonl', '.ndjson')
+def read_jsonl(f: IO[str]) -> Iterator[Row]:
+    ''' one JSON object per line: {"name": ..., "price": ..., "quantity": ...} '''
+    for line in f:
+        if line.strip():
+            yield _record(json.loads(line))
+
+
+@register_loader('yaml', '.yaml', '.yml')
+def read_yaml(f: IO[str]) -> Iterator[Row]:
+    '''
+    documents separated by `---`, each one item mapping or a list of them.
+    documents are parsed one at a time, so one item per document keeps memory flat.
+    '''
+    try:
+        import yaml
+    except ImportError:     ## optional dependency
+        raise ImportError("reading YAML needs PyYAML (pip install pyyaml)") from None
+
+    ## libyaml based loader when PyYAML was built with it
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    for document in yaml.load_all(f, Loader=loader):
+        if document is None:
+            continue
+        for obj in (document if isinstance(document, list) else [document]):
+            yield _record(obj)
+
+
+def detect_format(source: Source) -> str:
+    ''' by extension, otherwise by sniffing the first non blank line '''
+    path = source if isinstance(source, str) else getattr(source, 'name', None)
+    if isinstance(path, str):
+        name = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if name is not None:
+            return name
+
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            head = f.read(1024)
+    elif source.seekable():
+        position = source.tell()
+        head = source.read(1024)
+        source.seek(position)
+    else:
+        raise ValueError("cannot detect the format of an unseekable stream, pass format=")
+
+    first = next((line.strip() for line in head.splitlines() if line.strip()), '')
+    if first.startswith('{'):
+        return 'jsonl'
+    if first.startswith(('---', '- ')) or (':' in first and ',' not in first):
+        return 'yaml'
+    return 'csv'
+
+
+def iter_chunks(rows: Iterable, chunk_size: int) -> Iterator[List]:
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size {chunk_size} must be positive")
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
@@ -1,10 +1,71 @@
-import csv 
+import gc
+import math
+import time
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import repeat
+from operator import itemgetter
+from numbers import Real
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:     ## optional dependency
+    np = None
+
+from ingest import LOADERS, LoadStats, Source, detect_format, iter_chunks, iter_rows, open_source
+
+def _non_negative(column: Sequence) -> bool:
+    ''' True when every value is an int / float >= 0 (NaN excluded) '''
+    types = set(map(type, column))
+    if not types <= {int, float}:
+        return False
+    if float in types and any(map(math.isnan, column)):
+        return False
+    return min(column) >= 0
+
+
+@contextmanager
+def _gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class InvalidRecords(ValueError):
+    ''' raised by `Item.from_records` with every bad row, not only the first one '''
+    def __init__(self, errors: List[Tuple[int, str]]) -> None:
+        self.errors = errors
+        shown = "; ".join(f"row {i}: {message}" for i, message in errors[:10])
+        more = f" (and {len(errors) - 10} more)" if len(errors) > 10 else ""
+        super().__init__(f"{len(errors)} invalid records: {shown}{more}")
+
 
 ## parent class
 class Item:
+    ## no per-instance __dict__ : attributes live in fixed slots
+    ## ('__name' is mangled to '_Item__name' just like the attribute)
+    __slots__ = ('__name', '__price', '__quantity', '__weakref__')
+
     all = []
     pay_rate = 0.5
-    def __init__(self, name: str, price: float, quantity: int) -> None:
+
+    ## objects told about every change : item_added(item), item_changed(item, field, old, new)
+    ## and optionally items_added(items), called once for a whole `from_records` batch
+    _observers = []
+
+    ## the scopes entered so far, innermost last; new items go to the innermost one,
+    ## or to `Item.all` when there is none (see registry.py). a context variable,
+    ## so a scope only redirects its own thread / asyncio task
+    _registry = ContextVar('item_registry', default=())
+
+    def __init__(self, name: str, price: float, quantity: int, register: bool = True) -> None:
 
         ## run validations to the received arguments
         assert price >= 0, f"Price {price} is not greater than or equal to zero"
@@ -13,23 +74,52 @@ class Item:
         ## assign to self object
         self.__name = name 
         self.__price = price 
-        self.quantity = quantity
+        self.__quantity = quantity
 
         ## actions to excute
-        Item.all.append(self)
+        if not register:
+            return
+        Item.registry().append(self)
+        if Item._observers:
+            for observer in Item._observers:
+                observer.item_added(self)
 
     @property 
     def price(self) -> float:
         return self.__price
     
     def apply_discount(self) -> None:
+        old = self.__price
         self.__price = self.__price * Item.pay_rate
+        if Item._observers:
+            self._notify('price', old, self.__price)
 
     def apply_increment(self, increments_num: int) -> float:
+        old = self.__price
         self.__price = self.__price + self.__price * increments_num
+        if Item._observers:
+            self._notify('price', old, self.__price)
+
+    def _set_price(self, value: float) -> None:
+        ''' raw price write for bulk operations (see repricing.py) '''
+        old = self.__price
+        self.__price = value
+        if Item._observers:
+            self._notify('price', old, value)
 
     def calculate_total_price(self) -> int:
-        return self.__price * self.quantity
+        return self.__price * self.__quantity
+
+    @property
+    def quantity(self) -> int:
+        return self.__quantity
+
+    @quantity.setter
+    def quantity(self, value: int) -> None:
+        old = self.__quantity
+        self.__quantity = value
+        if Item._observers:
+            self._notify('quantity', old, value)
 
     @property 
     ## property decorator : read-only attrribute
@@ -42,22 +132,164 @@ class Item:
             raise Exception('The name is toooo long')
         
         else:
+            old = self.__name
             self.__name = value
+            if Item._observers:
+                self._notify('name', old, value)
+
+    def _notify(self, field: str, old, new) -> None:
+        for observer in Item._observers:
+            observer.item_changed(self, field, old, new)
+
+    @staticmethod
+    def registry():
+        ''' where new items go in the current context: `Item.all` or the active scope '''
+        scopes = Item._registry.get()
+        return scopes[-1] if scopes else Item.all
+
+    @staticmethod
+    def observe(observer) -> None:
+        Item._observers.append(observer)
+
+    @staticmethod
+    def unobserve(observer) -> None:
+        if observer in Item._observers:
+            Item._observers.remove(observer)
     
 
     @classmethod
-    def read_from_csv(cls) -> None:
-        with open('items.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            items = list(reader)
-
-        for item in items:
-            Item(
-                name = item.get('name'),
-                price = float(item.get('price')),
-                quantity = int(item.get('quantity'))
-            )
-    
+    def read_from_csv(cls, source: Source = 'items.csv', chunk_size: int = 10_000,
+                      on_batch: Optional[Callable[[List['Item']], None]] = None,
+                      positional: bool = False) -> LoadStats:
+        '''
+        streams `source` (a path or a file object) in chunks of `chunk_size` rows,
+        so memory stays bounded by one chunk. each built chunk is passed to `on_batch`.
+
+        every chunk is validated before its objects are built, but chunks are
+        registered as they go: when a chunk raises `InvalidRecords`, the chunks
+        before it stay loaded. the rest of the source is still checked, so the
+        error lists every bad row, counted in data rows from the start of the source.
+        '''
+        with open_source(source) as f:
+            return cls._load_rows(iter_rows(f, positional), chunk_size, on_batch)
+
+    @classmethod
+    def load(cls, source: Source, format: Optional[str] = None, chunk_size: int = 10_000,
+             on_batch: Optional[Callable[[List['Item']], None]] = None) -> LoadStats:
+        '''
+        like `read_from_csv` for any registered format (csv, jsonl, yaml), detected when not given.
+        a bad chunk leaves the chunks before it loaded, as in `read_from_csv`.
+        '''
+        format = format or detect_format(source)
+        if format not in LOADERS:
+            raise ValueError(f"no loader for format {format!r}, known: {sorted(LOADERS)}")
+
+        with open_source(source) as f:
+            return cls._load_rows(LOADERS[format](f), chunk_size, on_batch)
+
+    @classmethod
+    def _load_rows(cls, rows: Iterable[Sequence], chunk_size: int,
+                   on_batch: Optional[Callable[[List['Item']], None]]) -> LoadStats:
+        start = time.perf_counter()
+        count = 0
+        chunks = iter_chunks(rows, chunk_size)
+        for chunk in chunks:
+            try:
+                items = cls.from_records(chunk)
+            except InvalidRecords as e:
+                ## from_records numbers rows within the chunk. the rest of the
+                ## source is only checked, so every bad row is reported at once
+                errors = [(count + row, message) for row, message in e.errors]
+                count += len(chunk)
+                for chunk in chunks:
+                    errors.extend((count + row, message) for row, message in cls._check_records(chunk))
+                    count += len(chunk)
+                raise InvalidRecords(errors) from None
+            count += len(items)
+            if on_batch is not None:
+                on_batch(items)
+
+        return LoadStats(count, time.perf_counter() - start)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Sequence], register: bool = True) -> List['Item']:
+        '''
+        builds a whole batch of (name, price, quantity) rows at once.
+        every row is validated first, with real checks instead of `assert`,
+        so they also run under `python -O`; all bad rows are reported together.
+        '''
+        rows = records if isinstance(records, list) else list(records)
+        if not rows:
+            return []
+
+        ## whole-column checks run in C (map / min); only a failing batch is scanned row by row
+        columns = cls._record_columns(rows)
+        if columns is None or not cls._columns_ok(columns):
+            errors = cls._check_records(rows)
+            if errors:
+                raise InvalidRecords(errors)
+
+        ## the batch allocates no cycles, so the cyclic GC is paused instead of
+        ## being triggered again and again while the objects are created
+        with _gc_paused():
+            items = list(map(cls.__new__, repeat(cls, len(rows))))
+            for slot, column in zip(cls._record_slots(), columns):
+                deque(map(slot.__set__, items, column), maxlen=0)
+
+        if register:
+            Item._register_all(items)
+        return items
+
+    @classmethod
+    def _record_slots(cls) -> list:
+        ''' slot descriptors `from_records` fills, in column order '''
+        return [Item.__name, Item.__price, Item.__quantity]
+
+    @classmethod
+    def _record_columns(cls, rows: List[Sequence]) -> Optional[list]:
+        if min(map(len, rows)) < 3:
+            return None
+        return [list(map(itemgetter(i), rows)) for i in range(3)]
+
+    @classmethod
+    def _columns_ok(cls, columns: list) -> bool:
+        return (set(map(type, columns[0])) <= {str}
+                and _non_negative(columns[1]) and _non_negative(columns[2])
+                and all(Item.are_integers(columns[2])))
+
+    @classmethod
+    def _check_records(cls, rows: List[Sequence]) -> List[Tuple[int, str]]:
+        errors = []
+        for i, row in enumerate(rows):
+            if len(row) < 3:
+                errors.append((i, f"expected name, price, quantity, got {row!r}"))
+                continue
+            name, price, quantity = row[0], row[1], row[2]
+            if not isinstance(name, str):
+                errors.append((i, f"Name {name!r} is not a string"))
+            if not isinstance(price, Real):
+                errors.append((i, f"Price {price!r} is not a number"))
+            elif not price >= 0:
+                errors.append((i, f"Price {price!r} is not greater than or equal to zero"))
+            if not isinstance(quantity, Real):
+                errors.append((i, f"Quantity {quantity!r} is not a number"))
+            elif not quantity >= 0:
+                errors.append((i, f"Quantity {quantity!r} is not greater than or equal to zero"))
+            elif not Item.is_integer(quantity):
+                errors.append((i, f"Quantity {quantity!r} is not an integer"))
+        return errors
+
+    @staticmethod
+    def _register_all(items: List['Item']) -> None:
+        Item.registry().extend(items)
+        for observer in Item._observers:
+            items_added = getattr(observer, 'items_added', None)
+            if items_added is not None:
+                items_added(items)
+            else:
+                for item in items:
+                    observer.item_added(item)
+
     @staticmethod
     def is_integer(num: any) -> bool:
         if isinstance(num, float):
@@ -68,6 +300,30 @@ class Item:
         
         else:
             return False 
+
+    @staticmethod
+    def are_integers(values: Sequence) -> Sequence[bool]:
+        '''
+        `is_integer` for a whole list, `array.array` or NumPy array in one pass.
+        returns a boolean mask (a NumPy array for NumPy input, a list otherwise).
+        '''
+        if np is not None and isinstance(values, np.ndarray):
+            if values.dtype.kind in 'iub':
+                return np.ones(values.shape, dtype=bool)
+            if values.dtype.kind == 'f':
+                return np.isfinite(values) & (np.mod(values, 1) == 0)
+            return np.array([Item.is_integer(value) for value in values.ravel()],
+                            dtype=bool).reshape(values.shape)
+
+        if isinstance(values, array):
+            if values.typecode in 'fd':
+                return list(map(float.is_integer, values))
+            return [True] * len(values)
+
+        ## all plain ints (the usual case) is settled without a call per value
+        if set(map(type, values)) <= {int}:
+            return [True] * len(values)
+        return list(map(Item.is_integer, values))
         
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}('{self.name}', {self.price}, {self.quantity})"
@@ -84,7 +340,11 @@ class Item:
     def __send(self):
         pass 
 
-    def send_email(self):
-        self.__connect()
+    def email_body(self) -> str:
+        ''' the notice text, also used by the batched sender in mailer.py '''
+        return self.__prepare_body()
+
+    def send_email(self, smpt_server) -> None:
+        self.__connect(smpt_server)
         self.__prepare_body()
         self.__send()
\ No newline at end of file
@@ -0,0 +1,310 @@
+""" Append-only mutation journal
+
+Every name / price / quantity change (and every new or removed item) is
+appended as a small binary record. Records are buffered and written + fsync'ed
+together (group commit) every `group_size` records, and a background thread
+commits whatever is buffered every `group_interval` seconds.
+
+    frame  : payload length u16 | crc32 u32 | payload
+    payload: op u8 | row u32 | value   (f64 price, i64 quantity, utf-8 name, a new item, or nothing)
+
+Rows are positions in the item list the journal was attached to, i.e. the
+order of the snapshot it belongs to; new items take the next row. Only items
+added to the journal's registry (`Item.all` by default) are journaled, and only
+those of a class with a snapshot tag: others could not be rebuilt on replay.
+Recovery after a crash:
+
+    items = recover('items.snap', 'items.journal')      ## snapshot + replay, then compacted
+    journal = ItemJournal('items.journal', items)
+
+`recover` writes the replayed state as the new snapshot and empties the journal:
+a replay that removed items shifts the rows after them, so the old records and
+new ones could not share the file. `ItemJournal` refuses a non-empty journal
+whose rows do not fit the given items. `compact` folds a live journal into a
+fresh snapshot and empties it.
+"""
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+from typing import Iterable, List, Optional
+
+from item import Item
+from phone import Phone
+from registry import ItemScope, WeakRegistry
+from snapshot import CLASSES, TAGS, load_snapshot, save_snapshot
+
+FRAME = struct.Struct('<HI')
+HEAD = struct.Struct('<BI')
+PRICE = struct.Struct('<d')
+QUANTITY = struct.Struct('<q')
+NEW_ITEM = struct.Struct('<Bdqq')    ## tag, price, quantity, broken_phones, then the name
+
+OP_PRICE, OP_QUANTITY, OP_NAME, OP_ADD, OP_REMOVE = 1, 2, 3, 4, 5
+
+
+class _RowRef(weakref.ref):
+    """ weak reference to a journaled item of a WeakRegistry, with its row """
+    __slots__ = ('key', 'row')
+
+
+def _check_rows(path: str, rows: int) -> None:
+    ''' refuses to append to a journal whose records don't fit `rows` items '''
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    for op, row, _ in read_journal(path):
+        if op == OP_REMOVE or row >= rows:
+            raise ValueError(f"{path} does not match the {rows} given items: "
+                             f"start from recover() or compact() it first")
+
+
+class ItemJournal:
+    def __init__(self, path: str, items: Optional[Iterable[Item]] = None,
+                 group_size: int = 1000, group_interval: Optional[float] = 0.05,
+                 registry=None) -> None:
+        '''
+        `items` are the rows so far (default `Item.all`). new items are journaled
+        when they are added to `registry`: by default `items` itself when it is
+        an ItemScope / WeakRegistry, `Item.all` otherwise.
+        '''
+        self.path = path
+        self.group_size = group_size
+        self.group_interval = group_interval
+        items = Item.all if items is None else items
+        if registry is None:
+            registry = items if isinstance(items, (ItemScope, WeakRegistry)) else Item.all
+        self.registry = registry
+        ## strong registries keep their items alive until item_removed, weak ones don't
+        self._weak = isinstance(registry, WeakRegistry)
+        self._set_rows(items)
+        _check_rows(path, self._next_row)
+
+        self._file = open(path, 'ab')
+        self._buffer = bytearray()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        ## observers run on any thread, the flusher on its own
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if group_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+        Item.observe(self)
+
+    def _set_rows(self, items: Iterable[Item]) -> None:
+        ## id(item) -> row, or id(item) -> _RowRef when following a WeakRegistry:
+        ## the weakref tells a live item from a new one that reused the id, and
+        ## queues a remove record once the item is collected
+        self.rows = {}
+        self._collected: List[_RowRef] = []
+        row = -1
+        for row, item in enumerate(items):
+            self._track(item, row)
+        self._next_row = row + 1
+
+    def _track(self, item: Item, row: int) -> None:
+        if not self._weak:
+            self.rows[id(item)] = row
+            return
+        ## the callback may run during any allocation, it only queues the removal
+        ref = self.rows[id(item)] = _RowRef(item, self._collected.append)
+        ref.key, ref.row = id(item), row
+
+    def _row(self, item: Item) -> Optional[int]:
+        if not self._weak:
+            return self.rows.get(id(item))
+        ref = self.rows.get(id(item))
+        return ref.row if ref is not None and ref() is item else None
+
+    def _drain_collected(self) -> None:
+        ''' remove records for tracked items that were garbage collected (lock held) '''
+        while self._collected:
+            ref = self._collected.pop()
+            if self.rows.get(ref.key) is ref:
+                del self.rows[ref.key]
+                self._write(OP_REMOVE, ref.row, b'')
+
+    def __enter__(self) -> 'ItemJournal':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        Item.unobserve(self)
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.commit()
+        self._file.close()
+
+    ## observer protocol
+    def item_added(self, item: Item) -> None:
+        tag = TAGS.get(type(item))
+        if tag is None or Item.registry() is not self.registry:
+            return
+        with self._lock:
+            self._drain_collected()
+            row = self._next_row
+            self._next_row += 1
+            self._track(item, row)
+            self._append(OP_ADD, row, NEW_ITEM.pack(tag, item.price, item.quantity,
+                                                    getattr(item, 'broken_phones', 0)) + item.name.encode())
+
+    def item_removed(self, item: Item) -> None:
+        with self._lock:
+            row = self._row(item)
+            if row is not None:
+                del self.rows[id(item)]
+                self._append(OP_REMOVE, row, b'')
+
+    def item_changed(self, item: Item, field: str, old, new) -> None:
+        row = self._row(item)
+        if row is None:
+            return
+        if field == 'price':
+            self._append(OP_PRICE, row, PRICE.pack(new))
+        elif field == 'quantity':
+            self._append(OP_QUANTITY, row, QUANTITY.pack(new))
+        elif field == 'name':
+            self._append(OP_NAME, row, new.encode())
+
+    ## group commit
+    def _append(self, op: int, row: int, value: bytes) -> None:
+        with self._lock:
+            self._drain_collected()
+            self._write(op, row, value)
+            if self._pending >= self.group_size:
+                self.commit()
+
+    def _write(self, op: int, row: int, value: bytes) -> None:
+        payload = HEAD.pack(op, row) + value
+        self._buffer += FRAME.pack(len(payload), zlib.crc32(payload))
+        self._buffer += payload
+        self._pending += 1
+
+    def _flush_loop(self) -> None:
+        ''' commits buffered records at least every `group_interval` seconds, even when writes stop '''
+        while not self._closed.wait(self.group_interval):
+            with self._lock:
+                if self._buffer and time.monotonic() - self._last_commit >= self.group_interval:
+                    self.commit()
+
+    def commit(self) -> None:
+        ''' writes the buffered records and fsyncs them in one go '''
+        with self._lock:
+            self._drain_collected()
+            if self._buffer:
+                self._file.write(self._buffer)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._buffer = bytearray()
+            self._pending = 0
+            self._last_commit = time.monotonic()
+
+
+def read_journal(path: str):
+    ''' yields (op, row, value); stops at the first torn or corrupt record '''
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset += FRAME.size + length
+
+        op, row = HEAD.unpack_from(payload)
+        value = payload[HEAD.size:]
+        if op == OP_PRICE:
+            value = PRICE.unpack(value)[0]
+        elif op == OP_QUANTITY:
+            value = QUANTITY.unpack(value)[0]
+        elif op == OP_NAME:
+            value = value.decode()
+        elif op == OP_ADD:
+            tag, price, quantity, broken = NEW_ITEM.unpack_from(value)
+            value = (CLASSES[tag], value[NEW_ITEM.size:].decode(), price, quantity, broken)
+        yield op, row, value
+
+
+def replay(path: str, items: List[Item], register: bool = True) -> int:
+    '''
+    applies the journal to `items` (loaded from the matching snapshot) in place,
+    new items are appended and removed ones taken out at the end, so rows keep
+    their meaning while the records are applied. with `register`, removed
+    items also leave `Item.all`. returns the number of records applied.
+    '''
+    applied = 0
+    removed = set()
+    for op, row, value in read_journal(path):
+        if op == OP_ADD:
+            cls, name, price, quantity, broken = value
+            if row < len(items):    ## already part of the snapshot
+                continue
+            if cls is Phone:
+                items.append(Phone(name, price, quantity, broken, register=register))
+            else:
+                items.append(cls(name, price, quantity, register=register))
+        elif row >= len(items):
+            continue
+        elif op == OP_PRICE:
+            items[row]._set_price(value)
+        elif op == OP_QUANTITY:
+            items[row].quantity = value
+        elif op == OP_NAME:
+            items[row].name = value
+        elif op == OP_REMOVE:
+            removed.add(row)
+        applied += 1
+
+    if removed:
+        gone = {id(items[row]) for row in removed}
+        items[:] = [item for row, item in enumerate(items) if row not in removed]
+        if register:
+            Item.all[:] = [item for item in Item.all if id(item) not in gone]
+    return applied
+
+
+def _write_snapshot(snapshot_path: str, items: List[Item]) -> None:
+    ''' replaces the snapshot atomically '''
+    tmp = snapshot_path + '.tmp'
+    save_snapshot(tmp, items)
+    with open(tmp, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, snapshot_path)
+
+
+def recover(snapshot_path: str, journal_path: str, register: bool = True) -> List[Item]:
+    '''
+    loads the snapshot, replays the journal on it, then writes the result as the
+    new snapshot and empties the journal, ready for a new `ItemJournal`.
+    '''
+    with load_snapshot(snapshot_path) as snap:
+        items = snap.materialize(register=register)
+    if os.path.exists(journal_path):
+        replay(journal_path, items, register=register)
+    _write_snapshot(snapshot_path, items)
+    with open(journal_path, 'wb') as f:
+        os.fsync(f.fileno())
+    return items
+
+
+def compact(journal: ItemJournal, snapshot_path: str, items: List[Item]) -> None:
+    '''
+    writes `items` (the current state) as a new snapshot and empties the journal.
+    the snapshot is replaced atomically before the journal is truncated.
+    '''
+    with journal._lock:
+        journal.commit()
+        _write_snapshot(snapshot_path, items)
+
+        journal._file.truncate(0)
+        journal._file.flush()
+        os.fsync(journal._file.fileno())
+        journal._set_rows(items)
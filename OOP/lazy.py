@@ -0,0 +1,152 @@
+""" On-demand item materialization
+
+Only the byte offset of every row is read up front (one `array('q')`).
+Rows come back as `LazyItem` placeholders that parse and validate their
+line the first time `price`, `name` or `quantity` is needed.
+
+    items = LazyItems('items.csv')
+    items[123_456].price        ## reads and parses just that one line
+
+Placeholders are not put in `Item.all`: registering them would make every
+observer read, and so load, every row.
+"""
+import csv
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from ingest import parse_quantity
+from item import InvalidRecords, Item
+
+
+class LazyItems:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        self._placeholders: Dict[int, 'LazyItem'] = {}
+
+        header = next(csv.reader([self._file.readline().decode()]), [])
+        self._columns = (header.index('name'), header.index('price'), header.index('quantity'))
+
+        ## the row-offset index, built once
+        self._offsets = array('q')
+        position = self._file.tell()
+        for line in self._file:
+            if line.strip():
+                self._offsets.append(position)
+            position += len(line)
+
+    def __enter__(self) -> 'LazyItems':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, row: int) -> 'LazyItem':
+        if row < 0:
+            row += len(self._offsets)
+        if not 0 <= row < len(self._offsets):
+            raise IndexError(f"row {row} is out of range")
+
+        item = self._placeholders.get(row)
+        if item is None:
+            item = self._placeholders[row] = LazyItem(self, row)
+        return item
+
+    def __iter__(self) -> Iterator['LazyItem']:
+        for row in range(len(self._offsets)):
+            yield self[row]
+
+    def materialized(self) -> List['LazyItem']:
+        ''' the placeholders that have been loaded so far '''
+        return [item for item in self._placeholders.values() if item.loaded]
+
+    def _parse(self, row: int) -> Tuple[str, float, int]:
+        self._file.seek(self._offsets[row])
+        record = next(csv.reader([self._file.readline().decode()]))
+        name_at, price_at, quantity_at = self._columns
+        try:
+            parsed = (record[name_at], float(record[price_at]), parse_quantity(record[quantity_at]))
+        except (IndexError, ValueError) as e:
+            raise InvalidRecords([(row, f"{record!r}: {e}")]) from None
+
+        errors = Item._check_records([parsed])
+        if errors:
+            raise InvalidRecords([(row, message) for _, message in errors])
+        return parsed
+
+
+class LazyItem(Item):
+    """ placeholder for one row of a `LazyItems` file, loaded on first use """
+    __slots__ = ('_source', '_row', 'loaded')
+
+    def __init__(self, source: LazyItems, row: int) -> None:
+        ## no call to Item.__init__ : nothing is read until needed
+        self._source = source
+        self._row = row
+        self.loaded = False
+
+    def _load(self) -> None:
+        for slot, value in zip(Item._record_slots(), self._source._parse(self._row)):
+            slot.__set__(self, value)
+        self.loaded = True
+
+    @property
+    def price(self) -> float:
+        if not self.loaded:
+            self._load()
+        return Item.price.fget(self)
+
+    @property
+    def name(self) -> str:
+        if not self.loaded:
+            self._load()
+        return Item.name.fget(self)
+
+    @name.setter
+    def name(self, value: str) -> None:
+        if not self.loaded:
+            self._load()
+        Item.name.fset(self, value)
+
+    @property
+    def quantity(self) -> int:
+        if not self.loaded:
+            self._load()
+        return Item.quantity.fget(self)
+
+    @quantity.setter
+    def quantity(self, value: int) -> None:
+        if not self.loaded:
+            self._load()
+        Item.quantity.fset(self, value)
+
+    def apply_discount(self) -> None:
+        if not self.loaded:
+            self._load()
+        super().apply_discount()
+
+    def apply_increment(self, increments_num: int) -> None:
+        if not self.loaded:
+            self._load()
+        super().apply_increment(increments_num)
+
+    def _set_price(self, value: float) -> None:
+        if not self.loaded:
+            self._load()
+        super()._set_price(value)
+
+    def calculate_total_price(self) -> float:
+        if not self.loaded:
+            self._load()
+        return super().calculate_total_price()
+
+    def __repr__(self) -> str:
+        if not self.loaded:
+            return f"{self.__class__.__name__}(<row {self._row} of {self._source.path}>)"
+        return super().__repr__()
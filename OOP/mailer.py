@@ -0,0 +1,219 @@
+""" Asynchronous item notifications
+
+`Item.send_email` talks to the server once per item. `MailPipeline` batches
+the notices of many items over a bounded pool of reused SMTP connections:
+
+    items -> bounded queue (backpressure) -> N workers, one connection each -> server
+
+smtplib is blocking, so every batch is sent from a worker thread
+(`asyncio.to_thread`); a failed send reconnects and retries with backoff.
+
+    report = asyncio.run(MailPipeline('localhost', 25, 'shop@example.com', ['ops@example.com']).run(Item.all))
+
+`LocalSMTPServer` is a tiny in-process stand-in server for tests and benchmarks.
+"""
+import asyncio
+import smtplib
+import time
+from collections import namedtuple
+from email.message import EmailMessage
+from typing import Iterable, List, Optional, Tuple
+
+from item import Item
+
+
+class MailReport(namedtuple('MailReport', ['sent', 'failed', 'seconds'])):
+    def __str__(self) -> str:
+        rate = self.sent / self.seconds if self.seconds else 0.0
+        return f"{self.sent} sent, {len(self.failed)} failed in {self.seconds:.3f}s ({rate:,.0f} mails/s)"
+
+
+class MailPipeline:
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str],
+                 connections: int = 4, batch_size: int = 50, queue_size: int = 1000,
+                 retries: int = 3, backoff: float = 0.05) -> None:
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.connections = connections
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.retries = retries
+        self.backoff = backoff
+
+    def message(self, item: Item) -> EmailMessage:
+        msg = EmailMessage()
+        msg['From'] = self.sender
+        msg['To'] = ', '.join(self.recipients)
+        msg['Subject'] = f"Stock notice: {item.name}"
+        msg.set_content(item.email_body())
+        return msg
+
+    async def run(self, items: Iterable[Item]) -> MailReport:
+        '''
+        sends every item. an error other than a failed send (e.g. from `email_body`)
+        stops the pipeline: the other workers are cancelled and the error is raised.
+        '''
+        start = time.perf_counter()
+        ## bounded: the producer waits while the workers are behind
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        failed: List[Item] = []
+
+        workers = [asyncio.create_task(self._worker(queue, failed))
+                   for _ in range(self.connections)]
+        try:
+            for item in items:
+                await self._put(queue, item, workers)
+            for _ in workers:
+                await self._put(queue, None, workers)
+            sent = sum(await asyncio.gather(*workers))
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        return MailReport(sent, failed, time.perf_counter() - start)
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, item: Optional[Item], workers: List[asyncio.Task]) -> None:
+        ''' queue.put() that gives up when a worker dies instead of waiting for it forever '''
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait([put, *workers], return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return
+        put.cancel()
+        for worker in workers:
+            if worker.done():
+                worker.result()     ## raises the worker's error
+        raise RuntimeError("a mail worker stopped before the end of the queue")
+
+    async def _worker(self, queue: asyncio.Queue, failed: List[Item]) -> int:
+        ''' returns the number of mails it sent '''
+        connection: Optional[smtplib.SMTP] = None
+        sent = 0
+        done = False
+        try:
+            while not done:
+                batch = []
+                item = await queue.get()
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size or queue.empty():
+                        break
+                    item = queue.get_nowait()
+                done = item is None
+
+                if batch:
+                    connection, count = await self._send_batch(connection, batch, failed)
+                    sent += count
+        finally:
+            if connection is not None:
+                await asyncio.to_thread(self._close, connection)
+        return sent
+
+    async def _send_batch(self, connection: Optional[smtplib.SMTP], batch: List[Item],
+                          failed: List[Item]) -> Tuple[Optional[smtplib.SMTP], int]:
+        pending = batch
+        sent = 0
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                if connection is None:
+                    connection = await asyncio.to_thread(smtplib.SMTP, self.host, self.port)
+                count, pending = await asyncio.to_thread(self._send_all, connection, pending)
+                sent += count
+                if not pending:
+                    return connection, sent
+            except (smtplib.SMTPException, OSError):
+                pass
+            except BaseException:
+                ## stopping (a bad item or a cancel): the worker never gets this connection back
+                if connection is not None:
+                    connection.close()
+                raise
+            ## drop the connection, the next attempt reconnects
+            if connection is not None:
+                await asyncio.to_thread(self._close, connection)
+                connection = None
+
+        failed.extend(pending)
+        return connection, sent
+
+    def _send_all(self, connection: smtplib.SMTP, batch: List[Item]) -> Tuple[int, List[Item]]:
+        ''' runs in a worker thread, returns how many were sent and the items still to send '''
+        for i, item in enumerate(batch):
+            try:
+                connection.send_message(self.message(item), self.sender, self.recipients)
+            except (smtplib.SMTPException, OSError):
+                return i, batch[i:]
+        return len(batch), []
+
+    @staticmethod
+    def _close(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+
+class LocalSMTPServer:
+    """
+    accepts just enough SMTP for smtplib and keeps every message in `messages`.
+
+        async with LocalSMTPServer() as server:
+            await MailPipeline('127.0.0.1', server.port, ...).run(items)
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.messages: List[bytes] = []
+        self._server = None
+
+    async def __aenter__(self) -> 'LocalSMTPServer':
+        self._server = await asyncio.start_server(self._session, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        def reply(line: str) -> None:
+            writer.write(line.encode() + b'\r\n')
+
+        reply('220 localhost ready')
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].upper()
+
+                if command in (b'EHLO', b'HELO'):
+                    reply('250 localhost')
+                elif command == b'DATA':
+                    reply('354 end with <CRLF>.<CRLF>')
+                    await writer.drain()
+                    data = []
+                    line = await reader.readline()
+                    while line and line != b'.\r\n':
+                        data.append(line)
+                        line = await reader.readline()
+                    self.messages.append(b''.join(data))
+                    reply('250 OK')
+                elif command == b'QUIT':
+                    reply('221 bye')
+                    await writer.drain()
+                    break
+                else:   ## MAIL, RCPT, RSET, NOOP
+                    reply('250 OK')
+        finally:
+            writer.close()
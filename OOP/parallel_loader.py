@@ -0,0 +1,114 @@
+""" Multi-process sharded CSV loader
+
+The file is split into byte ranges, every range is moved forward to the next
+line boundary, and each shard is parsed and validated in its own process.
+Shards come back in file order, so the registry ends up in the same order
+as with `Item.read_from_csv`.
+
+Shards travel back as columns (names, array('d') prices, array('q') quantities),
+which pickle much faster than one tuple per row, and the parent builds all of
+them with a single `from_records` call: nothing is registered unless every
+shard is valid.
+
+Quoted names (e.g. 'Mouse' in items.csv) are fine as long as a single record
+does not span several lines: shard boundaries are plain newlines.
+"""
+import csv
+import io
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from ingest import LoadStats, parse_quantity
+from item import InvalidRecords, Item
+
+## names, prices, quantities, (row in shard, message) per bad row, rows seen
+Shard = Tuple[List[str], array, array, List[Tuple[int, str]], int]
+
+
+def split_ranges(path: str, shards: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    ''' returns the header and `shards` (start, end) byte ranges aligned to line starts '''
+    size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode()]), [])
+        body = f.tell()
+
+        bounds = [body]
+        for i in range(1, shards):
+            f.seek(max(body + (size - body) * i // shards - 1, bounds[-1]))
+            f.readline()    ## move to the start of the next line
+            bounds.append(max(f.tell(), bounds[-1]))
+        bounds.append(size)
+
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+    return header, ranges
+
+
+def parse_shard(path: str, start: int, end: int, columns: Tuple[int, int, int]) -> Shard:
+    ''' parses and validates one byte range into columns '''
+    with open(path, 'rb') as f:
+        f.seek(start)
+        ## newline='' : only the newlines that bound shards end a record
+        ## (str.splitlines() would also split on \x0c, \x85, \u2028 ...)
+        lines = io.StringIO(f.read(end - start).decode(), newline='')
+
+    name_at, price_at, quantity_at = columns
+    names, prices, quantities = [], array('d'), array('q')
+    errors = []
+    row = -1
+    for record in csv.reader(lines):
+        if not record:
+            continue
+        row += 1
+        try:
+            price, quantity = float(record[price_at]), parse_quantity(record[quantity_at])
+        except (IndexError, ValueError) as e:
+            errors.append((row, f"{record!r}: {e}"))
+            continue
+
+        if price < 0 or quantity < 0:
+            errors.append((row, f"{record!r}: price and quantity must be greater than or equal to zero"))
+            continue
+        if not Item.is_integer(quantity):
+            errors.append((row, f"{record!r}: quantity is not an integer"))
+            continue
+        names.append(record[name_at])
+        prices.append(price)
+        quantities.append(quantity)
+
+    return names, prices, quantities, errors, row + 1
+
+
+def read_csv_parallel(path: str = 'items.csv', cls: type = Item,
+                      workers: Optional[int] = None) -> LoadStats:
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    header, ranges = split_ranges(path, workers)
+    if not ranges:
+        return LoadStats(0, time.perf_counter() - start)
+
+    columns = (header.index('name'), header.index('price'), header.index('quantity'))
+    n = len(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ## map() yields in submission order -> stable merge
+        shards = list(pool.map(parse_shard, [path] * n,
+                               [s for s, _ in ranges], [e for _, e in ranges], [columns] * n))
+
+    ## row numbers count data rows from the start of the file, like `from_records`
+    errors, offset = [], 0
+    for _, _, _, shard_errors, seen in shards:
+        errors.extend((offset + row, message) for row, message in shard_errors)
+        offset += seen
+    if errors:
+        raise InvalidRecords(errors)
+
+    rows = []
+    for names, prices, quantities, _, _ in shards:
+        rows.extend(zip(names, prices, quantities))
+    ## one batch: the checks run again (without assert) before anything is registered
+    items = cls.from_records(rows)
+
+    return LoadStats(len(items), time.perf_counter() - start)
@@ -1,13 +1,50 @@
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
+
 from item import Item
 
 # child class 
 class Phone(Item):
+    __slots__ = ('broken_phones',)
+
     def __init__(self, name: str, price: float, 
-                    quantity: int, broken_phones=0) -> None:
+                    quantity: int, broken_phones=0, register: bool = True) -> None:
+        assert broken_phones >= 0, f"broken_phones {broken_phones} is not greater than or equal to zero"
+
+        ## set before super() registers the phone, so observers see a complete object
+        self.broken_phones = broken_phones
+
         ## call super() to have access to all attributes / methods
         ## avoid code duplicates 
-        super().__init__(name, price, quantity)
+        super().__init__(name, price, quantity, register)
 
-        assert broken_phones >= 0, f"broken_phones {broken_phones} is not greater than or equal to zero"
+    @classmethod
+    def _record_slots(cls) -> list:
+        return super()._record_slots() + [Phone.broken_phones]
+
+    @classmethod
+    def _record_columns(cls, rows: List[Sequence]) -> Optional[list]:
+        ## rows are (name, price, quantity) or (name, price, quantity, broken_phones)
+        columns = super()._record_columns(rows)
+        if columns is None:
+            return None
+        if min(map(len, rows)) > 3:
+            broken = list(map(itemgetter(3), rows))
+        else:
+            broken = [row[3] if len(row) > 3 else 0 for row in rows]
+        return columns + [broken]
+
+    @classmethod
+    def _columns_ok(cls, columns: list) -> bool:
+        broken = columns[3]
+        return (super()._columns_ok(columns)
+                and set(map(type, broken)) <= {int} and min(broken) >= 0)
 
-        self.broken_phones = broken_phones
\ No newline at end of file
+    @classmethod
+    def _check_records(cls, rows: List[Sequence]) -> List[Tuple[int, str]]:
+        errors = super()._check_records(rows)
+        for i, row in enumerate(rows):
+            if len(row) > 3 and not (isinstance(row[3], int) and row[3] >= 0):
+                errors.append((i, f"broken_phones {row[3]!r} is not greater than or equal to zero"))
+        errors.sort(key=lambda error: error[0])
+        return errors
@@ -0,0 +1,119 @@
+""" Fleet-wide broken phone analytics
+
+The phones are turned into columns once (price, quantity, broken_phones),
+then every figure is computed over whole columns: NumPy when installed,
+otherwise C-level `map` / `sum` over `array` columns.
+
+    fleet = PhoneFleet()                ## every Phone in Item.all
+    fleet.stats()                       ## broken ratio, usable stock, value written off
+    fleet.by_prefix(3)                  ## the same, grouped on the first 3 letters of the name
+    fleet.worst(10)                     ## top-k phones by value written off
+"""
+import heapq
+import operator
+from array import array
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:     ## optional dependency
+    np = None
+
+from item import Item
+from phone import Phone
+
+
+class FleetStats(namedtuple('FleetStats', ['phones', 'quantity', 'broken', 'usable', 'written_off'])):
+    @property
+    def broken_ratio(self) -> float:
+        return self.broken / self.quantity if self.quantity else 0.0
+
+
+class PhoneFleet:
+    def __init__(self, items: Optional[Iterable[Item]] = None) -> None:
+        self.phones: List[Phone] = [item for item in (Item.all if items is None else items)
+                                    if isinstance(item, Phone)]
+        prices = [phone.price for phone in self.phones]
+        quantities = [phone.quantity for phone in self.phones]
+        broken = [phone.broken_phones for phone in self.phones]
+
+        if np is not None:
+            self.price = np.array(prices, dtype=np.float64)
+            self.quantity = np.array(quantities, dtype=np.int64)
+            self.broken = np.array(broken, dtype=np.int64)
+        else:
+            self.price = array('d', prices)
+            self.quantity = array('q', quantities)
+            self.broken = array('q', broken)
+
+    def __len__(self) -> int:
+        return len(self.phones)
+
+    ## per phone columns
+    def usable(self):
+        ''' quantity minus broken, never below zero '''
+        if np is not None:
+            return np.maximum(self.quantity - self.broken, 0)
+        return array('q', [max(q - b, 0) for q, b in zip(self.quantity, self.broken)])
+
+    def written_off(self):
+        ''' value of the broken units at the current price '''
+        if np is not None:
+            return self.price * self.broken
+        return array('d', map(operator.mul, self.price, self.broken))
+
+    ## fleet wide
+    def stats(self) -> FleetStats:
+        if np is not None:
+            return FleetStats(len(self), int(self.quantity.sum()), int(self.broken.sum()),
+                              int(self.usable().sum()), float(self.written_off().sum()))
+        return FleetStats(len(self), sum(self.quantity), sum(self.broken),
+                          sum(self.usable()), sum(self.written_off()))
+
+    def by_prefix(self, length: int = 3) -> Dict[str, FleetStats]:
+        prefixes = [phone.name[:length] for phone in self.phones]
+        usable, written_off = self.usable(), self.written_off()
+
+        if np is not None:
+            keys, group = np.unique(np.array(prefixes, dtype=object), return_inverse=True)
+            n = len(keys)
+            counts = np.bincount(group, minlength=n)
+            sums = [np.bincount(group, weights=column, minlength=n)
+                    for column in (self.quantity, self.broken, usable, written_off)]
+            return {key: FleetStats(int(counts[i]), int(sums[0][i]), int(sums[1][i]),
+                                    int(sums[2][i]), float(sums[3][i]))
+                    for i, key in enumerate(keys)}
+
+        groups: Dict[str, List] = {}
+        for row in zip(prefixes, self.quantity, self.broken, usable, written_off):
+            totals = groups.get(row[0])
+            if totals is None:
+                totals = groups[row[0]] = [0, 0, 0, 0, 0.0]
+            totals[0] += 1
+            for i in range(1, 5):
+                totals[i] += row[i]
+        return {key: FleetStats(*totals) for key, totals in groups.items()}
+
+    def worst(self, k: int = 10, by: str = 'written_off') -> List[Phone]:
+        ''' the k phones with the highest `written_off` value or `broken_ratio` (0.0 without stock) '''
+        if by == 'written_off':
+            scores = self.written_off()
+        elif by == 'broken_ratio':
+            ## same rule on both paths (and in FleetStats): no stock means a ratio of 0.0
+            if np is not None:
+                scores = np.divide(self.broken, self.quantity, out=np.zeros(len(self.phones)),
+                                   where=self.quantity > 0)
+            else:
+                scores = [b / q if q else 0.0 for q, b in zip(self.quantity, self.broken)]
+        else:
+            raise ValueError(f"unknown ranking {by!r}, use 'written_off' or 'broken_ratio'")
+
+        if np is not None:
+            k = min(k, len(scores))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [self.phones[i] for i in top]
+        return [self.phones[i] for i in heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)]
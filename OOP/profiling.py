@@ -0,0 +1,143 @@
+""" Opt-in hot path profiling for Item and its subclasses
+
+    with Profiler() as profiler:        ## wraps the methods only while enabled
+        run_pricing()
+    print(profiler.to_json())
+
+While disabled the original functions are back on the classes,
+so switched off it costs nothing at all.
+
+Per method: calls, cumulative time, latency percentiles (from a bounded
+sample) and net allocated memory blocks (`sys.getallocatedblocks`).
+"""
+import json
+import random
+import sys
+import time
+from functools import wraps
+from typing import Dict, Iterable, List, Optional
+
+from item import Item
+
+## what gets wrapped when defined in a class' own namespace
+METHODS = ('__init__', 'price', 'name', 'quantity', 'apply_discount', 'apply_increment',
+           'calculate_total_price', '__repr__')
+
+
+class MethodStats:
+    __slots__ = ('calls', 'seconds', 'blocks', 'samples', '_rnd', 'max_samples')
+
+    def __init__(self, max_samples: int) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.blocks = 0
+        self.samples: List[float] = []
+        self.max_samples = max_samples
+        self._rnd = random.Random(0)
+
+    def add(self, seconds: float, blocks: int) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.blocks += blocks
+        ## reservoir sampling keeps the percentiles honest with bounded memory
+        if len(self.samples) < self.max_samples:
+            self.samples.append(seconds)
+        else:
+            i = self._rnd.randrange(self.calls)
+            if i < self.max_samples:
+                self.samples[i] = seconds
+
+    def percentiles(self, *ps: float) -> List[float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [0.0 for _ in ps]
+        return [ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] for p in ps]
+
+    def as_dict(self) -> Dict:
+        p50, p90, p99 = self.percentiles(50, 90, 99)
+        return {
+            'calls': self.calls,
+            'total_s': self.seconds,
+            'mean_us': self.seconds / self.calls * 1e6 if self.calls else 0.0,
+            'p50_us': p50 * 1e6, 'p90_us': p90 * 1e6, 'p99_us': p99 * 1e6,
+            'allocated_blocks': self.blocks,
+        }
+
+
+def _subclasses(cls: type) -> List[type]:
+    found = [cls]
+    for sub in cls.__subclasses__():
+        found.extend(_subclasses(sub))
+    return found
+
+
+class Profiler:
+    def __init__(self, classes: Optional[Iterable[type]] = None, max_samples: int = 10_000) -> None:
+        ## default: Item and every subclass known at enable() time
+        self._classes = classes
+        self.max_samples = max_samples
+        self.stats: Dict[str, MethodStats] = {}
+        self._originals = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def __enter__(self) -> 'Profiler':
+        self.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.disable()
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        classes = list(self._classes) if self._classes is not None else _subclasses(Item)
+        for cls in classes:
+            for name in METHODS:
+                original = cls.__dict__.get(name)
+                if original is None:
+                    continue
+                label = f"{cls.__name__}.{name}"
+                if isinstance(original, property):
+                    wrapped = property(
+                        self._wrap(original.fget, label) if original.fget else None,
+                        self._wrap(original.fset, label + '.set') if original.fset else None,
+                        original.fdel, original.__doc__)
+                else:
+                    wrapped = self._wrap(original, label)
+                self._originals.append((cls, name, original))
+                setattr(cls, name, wrapped)
+
+    def disable(self) -> None:
+        while self._originals:
+            cls, name, original = self._originals.pop()
+            setattr(cls, name, original)
+
+    def reset(self) -> None:
+        ## the wrappers hold on to their stats objects, so they are emptied in place
+        for stats in self.stats.values():
+            stats.__init__(self.max_samples)
+
+    def _wrap(self, fn, label: str):
+        stats = self.stats.get(label)
+        if stats is None:
+            stats = self.stats[label] = MethodStats(self.max_samples)
+        clock, blocks = time.perf_counter, sys.getallocatedblocks
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            before_blocks = blocks()
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.add(clock() - start, blocks() - before_blocks)
+        return wrapper
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {label: stats.as_dict() for label, stats in self.stats.items() if stats.calls}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
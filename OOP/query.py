@@ -0,0 +1,128 @@
+""" Lazy queries over the item registry
+
+    q = Query().price(10, 500).name(startswith='iPhone')
+    q.aggregate('sum', 'total')             ## one pass, nothing copied
+    q.group_by_class()                      ## {'Item': {...}, 'Phone': {...}}
+    q.top(10)                               ## bounded heap of size 10, never a full sort
+
+Every step only adds a predicate; items are pulled through a generator
+pipeline when a result is asked for.
+"""
+import heapq
+from operator import attrgetter, methodcaller
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from item import Item
+
+FIELDS: Dict[str, Callable[[Item], float]] = {
+    'price': attrgetter('price'),
+    'quantity': attrgetter('quantity'),
+    'total': methodcaller('calculate_total_price'),
+}
+AGGREGATES = ('count', 'sum', 'avg', 'min', 'max')
+
+
+class Query:
+    def __init__(self, items: Optional[Iterable[Item]] = None,
+                 predicates: tuple = ()) -> None:
+        ## None means `Item.all` as it is when the query runs
+        self._items = items
+        self._predicates = predicates
+
+    def where(self, predicate: Callable[[Item], bool]) -> 'Query':
+        return Query(self._items, self._predicates + (predicate,))
+
+    ## predicates
+    def name(self, equals: Optional[str] = None, startswith: Optional[str] = None,
+             contains: Optional[str] = None) -> 'Query':
+        query = self
+        if equals is not None:
+            query = query.where(lambda item: item.name == equals)
+        if startswith is not None:
+            query = query.where(lambda item: item.name.startswith(startswith))
+        if contains is not None:
+            query = query.where(lambda item: contains in item.name)
+        return query
+
+    def price(self, low: Optional[float] = None, high: Optional[float] = None) -> 'Query':
+        return self._between(FIELDS['price'], low, high)
+
+    def quantity(self, low: Optional[int] = None, high: Optional[int] = None) -> 'Query':
+        return self._between(FIELDS['quantity'], low, high)
+
+    def of_class(self, cls: type, exact: bool = False) -> 'Query':
+        if exact:
+            return self.where(lambda item: type(item) is cls)
+        return self.where(lambda item: isinstance(item, cls))
+
+    def _between(self, get, low, high) -> 'Query':
+        if low is not None and high is not None:
+            return self.where(lambda item: low <= get(item) <= high)
+        if low is not None:
+            return self.where(lambda item: get(item) >= low)
+        if high is not None:
+            return self.where(lambda item: get(item) <= high)
+        return self
+
+    ## evaluation
+    def __iter__(self) -> Iterator[Item]:
+        items = iter(Item.all if self._items is None else self._items)
+        for predicate in self._predicates:
+            items = filter(predicate, items)
+        return items
+
+    def count(self) -> int:
+        return sum(1 for _ in self)
+
+    def aggregate(self, how: str, field: str = 'total') -> Optional[float]:
+        ''' `how` is one of count, sum, avg, min, max; `field` one of price, quantity, total '''
+        return _Aggregate(field).feed_all(self).result(how)
+
+    def group_by_class(self, field: str = 'total') -> Dict[str, Dict[str, float]]:
+        ''' every aggregate of `field` per exact class, in one pass '''
+        groups: Dict[type, _Aggregate] = {}
+        for item in self:
+            group = groups.get(type(item))
+            if group is None:
+                group = groups[type(item)] = _Aggregate(field)
+            group.feed(item)
+        return {cls.__name__: {how: group.result(how) for how in AGGREGATES}
+                for cls, group in groups.items()}
+
+    def top(self, k: int, field: str = 'total') -> List[Item]:
+        ''' the k largest items by `field`, through a heap of size k '''
+        return heapq.nlargest(k, self, key=FIELDS[field])
+
+
+class _Aggregate:
+    __slots__ = ('get', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, field: str) -> None:
+        if field not in FIELDS:
+            raise ValueError(f"unknown field {field!r}, use one of {sorted(FIELDS)}")
+        self.get = FIELDS[field]
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def feed(self, item: Item) -> None:
+        value = self.get(item)
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def feed_all(self, items: Iterable[Item]) -> '_Aggregate':
+        for item in items:
+            self.feed(item)
+        return self
+
+    def result(self, how: str) -> Optional[float]:
+        if how == 'avg':
+            return self.sum / self.count if self.count else None
+        if how not in AGGREGATES:
+            raise ValueError(f"unknown aggregate {how!r}, use one of {AGGREGATES}")
+        return getattr(self, how)
@@ -0,0 +1,95 @@
+""" Registry scopes
+
+By default every new item is appended to `Item.all` and stays there forever.
+A scope redirects registration while it is active:
+
+    with ItemScope() as batch:          ## explicit, dropped as a whole
+        Item.read_from_csv('feed.csv')
+        price(batch)
+    batch.drop()
+
+    with WeakRegistry() as live:        ## items disappear once nothing else uses them
+        ...
+
+    Item('cable', 10, 3, register=False)    ## never registered at all
+"""
+import itertools
+import weakref
+from typing import Iterator, List
+
+from item import Item
+
+
+class _Scope:
+    '''
+    makes the registry the target of `Item.__init__` while the `with` block runs,
+    in the current thread / asyncio task only (`Item._registry` is a ContextVar)
+    '''
+    def __enter__(self):
+        Item._registry.set(Item._registry.get() + (self,))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        Item._registry.set(Item._registry.get()[:-1])
+
+    def _forget(self, items) -> None:
+        if Item._observers:
+            for item in items:
+                for observer in Item._observers:
+                    remove = getattr(observer, 'item_removed', None)
+                    if remove is not None:
+                        remove(item)
+
+
+class ItemScope(_Scope):
+    """ strong, ordered registry that can be dropped in one step """
+    def __init__(self) -> None:
+        self._items: List[Item] = []
+
+    def append(self, item: Item) -> None:
+        self._items.append(item)
+
+    def extend(self, items) -> None:
+        self._items.extend(items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Item]:
+        return iter(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def drop(self) -> None:
+        ''' releases every item of the scope. the list is swapped out, it is only walked when observers are attached '''
+        items, self._items = self._items, []
+        self._forget(items)
+
+
+class WeakRegistry(_Scope):
+    """
+    registry holding weak references only: an item leaves it as soon as
+    the last strong reference elsewhere goes away. iteration keeps insertion order.
+    """
+    def __init__(self) -> None:
+        self._items = weakref.WeakValueDictionary()
+        self._counter = itertools.count()
+
+    def append(self, item: Item) -> None:
+        self._items[next(self._counter)] = item
+
+    def extend(self, items) -> None:
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Item]:
+        return iter(list(self._items.values()))
+
+    def drop(self) -> None:
+        items = list(self._items.values())
+        self._items = weakref.WeakValueDictionary()
+        self._forget(items)
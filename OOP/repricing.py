@@ -0,0 +1,130 @@
+""" Bulk repricing
+
+Applies discounts and increments to a whole selection in one pass,
+with a different rate per class:
+
+    reprice(Item.all, pay_rates={Phone: 0.8})           ## Phone * 0.8, others * Item.pay_rate
+    reprice(store, increments={Item: 0.1, Phone: 0.2})  ## ItemStore -> vectorized
+    reprice(store, rows=store.filter(max_price=100))    ## only some rows of a store
+
+A rate given for a class also applies to its subclasses, the closest class wins.
+"""
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:     ## optional dependency
+    np = None
+
+from item import Item
+from store import ItemStore
+
+Rates = Dict[type, float]
+
+
+class RepriceReport(namedtuple('RepriceReport', ['changed', 'seconds'])):
+    def __str__(self) -> str:
+        return f"{self.changed} items repriced in {self.seconds:.3f}s"
+
+
+def _rate_for(cls: type, rates: Optional[Rates], default: float) -> float:
+    if rates:
+        for base in cls.__mro__:
+            if base in rates:
+                return rates[base]
+    return default
+
+
+def price_factor(cls: type, pay_rates: Optional[Rates] = None,
+                 increments: Optional[Union[float, Rates]] = None) -> float:
+    '''
+    the multiplier a single `reprice` run applies to items of `cls`:
+    the discount (`Item.apply_discount`) first, then the increment (`Item.apply_increment`).
+    '''
+    factor = 1.0
+    if pay_rates is not None:
+        factor *= _rate_for(cls, pay_rates, Item.pay_rate)
+    if increments is not None:
+        if isinstance(increments, dict):
+            factor *= 1 + _rate_for(cls, increments, 0.0)
+        else:
+            factor *= 1 + increments
+    return factor
+
+
+def reprice(items: Union[Iterable[Item], ItemStore, None] = None,
+            pay_rates: Optional[Rates] = None,
+            increments: Optional[Union[float, Rates]] = None,
+            rows: Optional[Iterable[int]] = None) -> RepriceReport:
+    '''
+    `pay_rates` discounts every item (classes missing from it use `Item.pay_rate`),
+    `increments` raises prices by a single rate or a per-class one.
+    `items` defaults to `Item.all`. for an ItemStore, `rows` (e.g. from
+    `ItemStore.filter`) limits the run to those rows; other selections are
+    simply the items passed in.
+    '''
+    start = time.perf_counter()
+    items = Item.all if items is None else items
+
+    if isinstance(items, ItemStore):
+        changed = _reprice_store(items, pay_rates, increments, rows)
+        return RepriceReport(changed, time.perf_counter() - start)
+    if rows is not None:
+        raise TypeError("rows= selects rows of an ItemStore, pass the items themselves otherwise")
+
+    factors = {}
+    changed = 0
+    for item in items:
+        cls = type(item)
+        factor = factors.get(cls)
+        if factor is None:
+            factor = factors[cls] = price_factor(cls, pay_rates, increments)
+
+        price = item.price
+        new_price = price * factor
+        if new_price != price:
+            item._set_price(new_price)
+            changed += 1
+
+    return RepriceReport(changed, time.perf_counter() - start)
+
+
+def _reprice_store(store: ItemStore, pay_rates: Optional[Rates],
+                   increments: Optional[Union[float, Rates]],
+                   rows: Optional[Iterable[int]] = None) -> int:
+    factors = [price_factor(cls, pay_rates, increments) for cls in store.classes]
+    if rows is not None:
+        rows = _check_rows(store, rows)
+
+    if np is not None:
+        if rows is None:
+            prices = store.prices
+            new_prices = prices * np.asarray(factors)[store.tags]
+            changed = int(np.count_nonzero(new_prices != prices))
+            prices[:] = new_prices
+            return changed
+        rows = np.asarray(rows, dtype=np.intp)
+        prices = store._price[rows]     ## fancy indexing copies, written back below
+        new_prices = prices * np.asarray(factors)[store._tag[rows]]
+        store._price[rows] = new_prices
+        return int(np.count_nonzero(new_prices != prices))
+
+    changed = 0
+    prices = store._price     ## array slices are copies, write to the column itself
+    tags = store._tag
+    for row in (range(len(store)) if rows is None else rows):
+        new_price = prices[row] * factors[tags[row]]
+        if new_price != prices[row]:
+            prices[row] = new_price
+            changed += 1
+    return changed
+
+
+def _check_rows(store: ItemStore, rows: Iterable[int]) -> List[int]:
+    ''' the rows once each, in order; the columns have spare capacity past len(store) '''
+    rows = sorted(set(rows))
+    if rows and not (0 <= rows[0] and rows[-1] < len(store)):
+        raise IndexError(f"rows must be within 0..{len(store) - 1}")
+    return rows
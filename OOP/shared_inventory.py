@@ -0,0 +1,146 @@
+""" Shared-memory inventory for multi-process workers
+
+One process publishes the price and quantity columns into a
+`multiprocessing.shared_memory` block, the workers attach to it read-only:
+
+    inventory = SharedInventory.publish(Item.all)           ## publisher
+    reader = SharedInventory.attach(inventory.name)         ## in a worker, no copy
+    price, quantity = reader.read(42)
+
+    layout : sequence u64 | count u64 | price f64 * count | quantity i64 * count
+
+Writes go through a seqlock: the publisher makes the sequence odd, writes,
+then makes it even again. Readers retry while it is odd or when it changed
+during their read, so they never return a torn price.
+"""
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from item import Item
+
+HEADER = struct.Struct('<QQ')
+SEQUENCE = struct.Struct('<Q')
+
+
+## whether attached blocks must be dropped from this process' resource tracker
+_own_tracker = None
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    '''
+    opens an existing block without taking ownership of it. before Python 3.13
+    attaching also registers the block with the resource tracker, which unlinks it
+    when a tracker of its own (an unrelated worker process) shuts down.
+    workers started by multiprocessing share the publisher's tracker and keep it.
+    '''
+    global _own_tracker
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)   ## 3.13+
+    except TypeError:
+        pass
+
+    if _own_tracker is None:
+        _own_tracker = os.name == 'posix' and resource_tracker._resource_tracker._fd is None
+    shm = shared_memory.SharedMemory(name=name)
+    if _own_tracker:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class SharedInventory:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self._shm = shm
+        self.owner = owner
+        _, self.count = HEADER.unpack_from(shm.buf, 0)
+
+        ## every view is kept so close() can release them all before shm.close()
+        buf = shm.buf if owner else shm.buf.toreadonly()
+        prices_at = HEADER.size
+        quantities_at = prices_at + 8 * self.count
+        prices = buf[prices_at:quantities_at]
+        quantities = buf[quantities_at:quantities_at + 8 * self.count]
+        self._header = buf[:HEADER.size]
+        self.prices = prices.cast('d')
+        self.quantities = quantities.cast('q')
+        self._views = [buf, prices, quantities, self._header, self.prices, self.quantities]
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @classmethod
+    def publish(cls, items: Optional[Iterable[Item]] = None,
+                name: Optional[str] = None) -> 'SharedInventory':
+        ''' copies price and quantity of `items` (default: `Item.all`) into a new block '''
+        items = list(Item.all if items is None else items)
+        size = HEADER.size + 16 * len(items)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        HEADER.pack_into(shm.buf, 0, 0, len(items))
+
+        inventory = cls(shm, owner=True)
+        for row, item in enumerate(items):
+            inventory.prices[row] = item.price
+            inventory.quantities[row] = item.quantity
+        return inventory
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedInventory':
+        return cls(_attach(name), owner=False)
+
+    def close(self) -> None:
+        while self._views:
+            view = self._views.pop()
+            if view is not self._shm.buf:
+                view.release()
+        self._shm.close()
+
+    def unlink(self) -> None:
+        ''' publisher only: frees the block once every worker is done '''
+        self._shm.unlink()
+
+    ## seqlock
+    @property
+    def version(self) -> int:
+        return SEQUENCE.unpack_from(self._header, 0)[0]
+
+    def read(self, row: int) -> Tuple[float, int]:
+        while True:
+            before = self.version
+            if before & 1:
+                time.sleep(0)   ## a write is in progress
+                continue
+            price, quantity = self.prices[row], self.quantities[row]
+            if self.version == before:
+                return price, quantity
+
+    def read_prices(self) -> List[float]:
+        ''' a consistent copy of the whole price column '''
+        while True:
+            before = self.version
+            if before & 1:
+                time.sleep(0)
+                continue
+            prices = self.prices.tolist()
+            if self.version == before:
+                return prices
+
+    def update(self, rows: Sequence[int], prices: Optional[Sequence[float]] = None,
+               quantities: Optional[Sequence[int]] = None) -> None:
+        ''' publisher only: one seqlock-protected batch of writes '''
+        if not self.owner:
+            raise PermissionError("attached inventories are read-only")
+
+        version = self.version
+        SEQUENCE.pack_into(self._header, 0, version + 1)
+        try:
+            if prices is not None:
+                for row, price in zip(rows, prices):
+                    self.prices[row] = price
+            if quantities is not None:
+                for row, quantity in zip(rows, quantities):
+                    self.quantities[row] = quantity
+        finally:
+            SEQUENCE.pack_into(self._header, 0, version + 2)
@@ -0,0 +1,147 @@
+""" Binary inventory snapshots
+
+Fixed width little-endian records, so row i is found without parsing rows 0..i-1.
+
+    header : magic b'ITEMSNAP' | version u16 | name width u16 | count u64
+    record : name (utf-8, zero padded) | price f64 | quantity i64 | tag u8 | broken_phones i64
+
+    save_snapshot('items.snap')                 ## Item.all by default
+    with load_snapshot('items.snap') as snap:   ## memory-mapped, nothing copied
+        snap.price(10)
+        snap.materialize()                      ## real Item / Phone objects
+"""
+import mmap
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:     ## optional dependency
+    np = None
+
+from item import Item
+from phone import Phone
+
+MAGIC = b'ITEMSNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sHHQ')
+
+## subclass tags stored in every record
+TAGS = {Item: 0, Phone: 1}
+CLASSES = {tag: cls for cls, tag in TAGS.items()}
+
+
+def _record_struct(name_width: int) -> struct.Struct:
+    return struct.Struct(f'<{name_width}sdqBq')
+
+
+def save_snapshot(path: str, items: Optional[Iterable[Item]] = None) -> int:
+    ''' writes `items` (default: `Item.all`) and returns the number of records '''
+    items = list(Item.all if items is None else items)
+    names = [item.name.encode() for item in items]
+    width = max(map(len, names), default=1) or 1
+    record = _record_struct(width)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, len(items)))
+        buffer = bytearray(record.size * len(items))
+        for i, (item, name) in enumerate(zip(items, names)):
+            tag = TAGS.get(type(item))
+            if tag is None:
+                raise TypeError(f"{type(item).__name__} has no snapshot tag")
+            record.pack_into(buffer, i * record.size, name, item.price, item.quantity,
+                             tag, getattr(item, 'broken_phones', 0))
+        f.write(buffer)
+
+    return len(items)
+
+
+class Snapshot:
+    """ read-only, memory-mapped view of a snapshot file """
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, width, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not an item snapshot (version {VERSION})")
+
+        self.name_width = width
+        self._count = count
+        self._record = _record_struct(width)
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''
+        unmaps the file. NumPy columns still alive keep the mapping: it is then
+        released with the last of them instead of raising BufferError.
+        '''
+        if self._mmap is None:
+            return
+        try:
+            self._mmap.close()
+        except BufferError:
+            ## exported views left: drop our reference, the mmap goes away with them
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _offset(self, i: int) -> int:
+        if not 0 <= i < self._count:
+            raise IndexError(f"record {i} is out of range")
+        return HEADER.size + i * self._record.size
+
+    def record(self, i: int) -> Tuple[str, float, int, type, int]:
+        ''' (name, price, quantity, class, broken_phones) of record i '''
+        name, price, quantity, tag, broken = self._record.unpack_from(self._mmap, self._offset(i))
+        return name.rstrip(b'\0').decode(), price, quantity, CLASSES[tag], broken
+
+    def name(self, i: int) -> str:
+        return self.record(i)[0]
+
+    def price(self, i: int) -> float:
+        return struct.unpack_from('<d', self._mmap, self._offset(i) + self.name_width)[0]
+
+    def quantity(self, i: int) -> int:
+        return struct.unpack_from('<q', self._mmap, self._offset(i) + self.name_width + 8)[0]
+
+    def column(self, field: str):
+        '''
+        one field of every record. with NumPy this is a strided view over the
+        mapped file (no copy), otherwise a list. a view stays valid after the
+        snapshot is closed: it keeps the mapping alive until it is dropped.
+        '''
+        if np is not None:
+            dtype = np.dtype([('name', f'S{self.name_width}'), ('price', '<f8'),
+                              ('quantity', '<i8'), ('tag', 'u1'), ('broken_phones', '<i8')])
+            records = np.frombuffer(self._mmap, dtype=dtype, count=self._count, offset=HEADER.size)
+            return records[field]
+
+        at = ('name', 'price', 'quantity', 'tag', 'broken_phones').index(field)
+        values = [row[at] for row in self._record.iter_unpack(
+            self._mmap[HEADER.size:HEADER.size + self._count * self._record.size])]
+        if field == 'name':
+            values = [name.rstrip(b'\0').decode() for name in values]
+        return values
+
+    def materialize(self, register: bool = True) -> List[Item]:
+        ''' builds real objects for every record '''
+        items = []
+        for i in range(self._count):
+            name, price, quantity, cls, broken = self.record(i)
+            if cls is Phone:
+                items.append(Phone(name, price, quantity, broken, register=register))
+            else:
+                items.append(cls(name, price, quantity, register=register))
+        return items
+
+
+def load_snapshot(path: str) -> Snapshot:
+    return Snapshot(path)
@@ -0,0 +1,153 @@
+""" SQLite-backed persistent item store
+
+    store = SQLiteItemStore('items.db')
+    store.upsert(Item.all)                  ## executemany, large transactions
+    store.get('Mouse')                      ## indexed point lookup
+    for item in store.price_range(10, 100): ## rows become objects one at a time
+        ...
+
+Every thread gets its own pooled connection (sqlite3 connections must not be
+shared between threads). Items built from rows are not registered in `Item.all`.
+
+Rows are keyed by (kind, name): an upsert of several items sharing both is
+rejected as a whole rather than collapsing them into one row.
+"""
+import sqlite3
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+from item import Item
+from phone import Phone
+
+KINDS = {cls.__name__: cls for cls in (Item, Phone)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price REAL NOT NULL CHECK (price >= 0),
+    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    broken_phones INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, name)
+);
+CREATE INDEX IF NOT EXISTS items_name ON items (name);
+CREATE INDEX IF NOT EXISTS items_price ON items (price);
+CREATE INDEX IF NOT EXISTS items_quantity ON items (quantity);
+"""
+
+UPSERT = """
+INSERT INTO items (kind, name, price, quantity, broken_phones) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (kind, name) DO UPDATE SET
+    price = excluded.price, quantity = excluded.quantity, broken_phones = excluded.broken_phones
+"""
+
+COLUMNS = "kind, name, price, quantity, broken_phones"
+
+
+class SQLiteItemStore:
+    def __init__(self, path: str, batch_size: int = 50_000) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        with self._connection() as db:
+            db.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        ''' the calling thread's connection, opened on first use '''
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def close(self) -> None:
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def __enter__(self) -> 'SQLiteItemStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    ## writes
+    def upsert(self, items: Optional[Iterable[Item]] = None) -> int:
+        '''
+        inserts or updates `items` (default: `Item.all`) in one transaction, sent
+        `batch_size` rows at a time, and returns the number of rows written.
+        raises ValueError, writing nothing, when two items share kind and name.
+        '''
+        items = iter(Item.all if items is None else items)
+        db = self._connection()
+        seen = set()
+        duplicates = []
+        with db:    ## one transaction, rolled back on any error
+            while True:
+                batch = []
+                for item in items:
+                    kind = type(item).__name__
+                    if kind not in KINDS:
+                        raise TypeError(f"{kind} cannot be stored")
+                    key = (kind, item.name)
+                    if key in seen:
+                        duplicates.append(key)
+                        continue
+                    seen.add(key)
+                    batch.append((kind, item.name, item.price, item.quantity,
+                                  getattr(item, 'broken_phones', 0)))
+                    if len(batch) >= self.batch_size:
+                        break
+                if not batch:
+                    break
+                db.executemany(UPSERT, batch)
+
+            if duplicates:
+                shown = ", ".join(f"{kind} {name!r}" for kind, name in duplicates[:10])
+                raise ValueError(f"{len(duplicates)} items share kind and name with another one: {shown}")
+        return len(seen)
+
+    def delete(self, name: str, cls: type = Item) -> bool:
+        with self._connection() as db:
+            cursor = db.execute("DELETE FROM items WHERE kind = ? AND name = ?", (cls.__name__, name))
+        return cursor.rowcount > 0
+
+    ## reads
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def get(self, name: str, cls: type = Item) -> Optional[Item]:
+        row = self._connection().execute(
+            f"SELECT {COLUMNS} FROM items WHERE kind = ? AND name = ?", (cls.__name__, name)).fetchone()
+        return None if row is None else _build(row)
+
+    def find(self, name: str) -> Iterator[Item]:
+        ''' every kind of item with this name '''
+        return self._select("name = ?", (name,))
+
+    def price_range(self, low: float, high: float) -> Iterator[Item]:
+        return self._select("price BETWEEN ? AND ? ORDER BY price", (low, high))
+
+    def quantity_range(self, low: int, high: int) -> Iterator[Item]:
+        return self._select("quantity BETWEEN ? AND ? ORDER BY quantity", (low, high))
+
+    def _select(self, where: str, params: tuple) -> Iterator[Item]:
+        cursor = self._connection().execute(f"SELECT {COLUMNS} FROM items WHERE {where}", params)
+        for row in cursor:
+            yield _build(row)
+
+
+def _build(row: tuple) -> Item:
+    kind, name, price, quantity, broken = row
+    if kind == 'Phone':
+        return Phone(name, price, quantity, broken, register=False)
+    return KINDS[kind](name, price, quantity, register=False)
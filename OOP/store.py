@@ -0,0 +1,265 @@
+""" Columnar item store
+
+Keeps name, price, quantity (and `broken_phones`, 0 for plain items) of every
+item in contiguous typed columns instead of one python object per item.
+NumPy is used when it is installed, otherwise the stdlib `array` module.
+
+    store = ItemStore.from_items(Item.all)
+    store.apply_discount()
+    store.total_price()
+
+`StoredItem` is a thin view over one row, so it can be used like an `Item`.
+views are always `StoredItem`, never the row's own class: `store.kind(row)`
+gives the class the row was stored from.
+"""
+import operator
+from array import array
+from typing import Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:     ## optional dependency
+    np = None
+
+from item import Item
+
+
+class ItemStore:
+    def __init__(self, capacity: int = 1024) -> None:
+        self.names: List[str] = []
+        self.classes: List[type] = [Item]
+        self._tags = {Item: 0}
+        self._size = 0
+
+        if np is not None:
+            self._price = np.zeros(capacity, dtype=np.float64)
+            self._quantity = np.zeros(capacity, dtype=np.int64)
+            self._tag = np.zeros(capacity, dtype=np.uint8)
+            self._broken = np.zeros(capacity, dtype=np.int64)
+        else:
+            self._price = array('d')
+            self._quantity = array('q')
+            self._tag = array('B')
+            self._broken = array('q')
+
+    @classmethod
+    def from_items(cls, items: Optional[Iterable[Item]] = None) -> 'ItemStore':
+        ''' copy existing items (default: `Item.all`) into a new store '''
+        items = Item.all if items is None else items
+        store = cls()
+        for item in items:
+            store.add(item.name, item.price, item.quantity, item.__class__,
+                      getattr(item, 'broken_phones', 0))
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> 'StoredItem':
+        if not 0 <= row < self._size:
+            raise IndexError(f"row {row} is out of range")
+        return StoredItem(self, row)
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield StoredItem(self, row)
+
+    def add(self, name: str, price: float, quantity: int, cls: type = Item,
+            broken_phones: int = 0) -> int:
+        ''' append one row and return its row number '''
+        if price < 0:
+            raise ValueError(f"Price {price} is not greater than or equal to zero")
+        if quantity < 0:
+            raise ValueError(f"Quantity {quantity} is not greater than or equal to zero")
+        if broken_phones < 0:
+            raise ValueError(f"broken_phones {broken_phones} is not greater than or equal to zero")
+
+        tag = self._tags.get(cls)
+        if tag is None:
+            tag = self._tags[cls] = len(self.classes)
+            self.classes.append(cls)
+
+        row = self._size
+        if np is not None:
+            if row == len(self._price):
+                self._grow()
+            self._price[row] = price
+            self._quantity[row] = quantity
+            self._tag[row] = tag
+            self._broken[row] = broken_phones
+        else:
+            self._price.append(price)
+            self._quantity.append(quantity)
+            self._tag.append(tag)
+            self._broken.append(broken_phones)
+
+        self.names.append(name)
+        self._size += 1
+        return row
+
+    def _grow(self) -> None:
+        capacity = max(2 * len(self._price), 1024)
+        self._price = np.resize(self._price, capacity)
+        self._quantity = np.resize(self._quantity, capacity)
+        self._tag = np.resize(self._tag, capacity)
+        self._broken = np.resize(self._broken, capacity)
+
+    ## column access
+    @property
+    def prices(self):
+        return self._price[:self._size]
+
+    @property
+    def quantities(self):
+        return self._quantity[:self._size]
+
+    @property
+    def tags(self):
+        return self._tag[:self._size]
+
+    @property
+    def broken_phones(self):
+        return self._broken[:self._size]
+
+    def kind(self, row: int) -> type:
+        return self.classes[self._tag[row]]
+
+    ## inventory wide operations
+    def total_price(self, rows: Optional[Iterable[int]] = None) -> float:
+        if np is not None:
+            prices, quantities = self.prices, self.quantities
+            if rows is not None:
+                rows = np.asarray(rows, dtype=np.intp)
+                prices, quantities = prices[rows], quantities[rows]
+            return float(np.dot(prices, quantities))
+
+        if rows is None:
+            return sum(map(operator.mul, self._price, self._quantity))
+        return sum(self._price[row] * self._quantity[row] for row in rows)
+
+    def apply_discount(self, pay_rate: Optional[float] = None,
+                       rows: Optional[Iterable[int]] = None) -> None:
+        ''' same as `Item.apply_discount`, for every row (or the given rows) at once '''
+        self._scale(Item.pay_rate if pay_rate is None else pay_rate, rows)
+
+    def apply_increment(self, increments_num: float,
+                        rows: Optional[Iterable[int]] = None) -> None:
+        self._scale(1 + increments_num, rows)
+
+    def _scale(self, factor: float, rows: Optional[Iterable[int]]) -> None:
+        if np is not None:
+            if rows is None:
+                self.prices[:] *= factor
+            else:
+                rows = np.asarray(rows, dtype=np.intp)
+                self._price[rows] *= factor
+            return
+
+        if rows is None:
+            self._price = array('d', [price * factor for price in self._price])
+        else:
+            for row in rows:
+                self._price[row] *= factor
+
+    def filter(self, min_price: Optional[float] = None, max_price: Optional[float] = None,
+               min_quantity: Optional[int] = None, max_quantity: Optional[int] = None,
+               cls: Optional[type] = None) -> List[int]:
+        ''' returns the row numbers matching every given bound (inclusive) '''
+        tag = None
+        if cls is not None:
+            tag = self._tags.get(cls)
+            if tag is None:
+                return []
+
+        if np is not None:
+            mask = np.ones(self._size, dtype=bool)
+            if min_price is not None:
+                mask &= self.prices >= min_price
+            if max_price is not None:
+                mask &= self.prices <= max_price
+            if min_quantity is not None:
+                mask &= self.quantities >= min_quantity
+            if max_quantity is not None:
+                mask &= self.quantities <= max_quantity
+            if tag is not None:
+                mask &= self.tags == tag
+            return np.flatnonzero(mask).tolist()
+
+        rows = []
+        for row, (price, quantity, row_tag) in enumerate(zip(self._price, self._quantity, self._tag)):
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            if min_quantity is not None and quantity < min_quantity:
+                continue
+            if max_quantity is not None and quantity > max_quantity:
+                continue
+            if tag is not None and row_tag != tag:
+                continue
+            rows.append(row)
+        return rows
+
+
+class StoredItem(Item):
+    """
+    view over one row of an `ItemStore`.
+    every read and write goes straight to the columns, nothing is copied.
+
+    a view is an `Item` whatever the row was stored from (use `store.kind(row)`),
+    and carries the three `Item` slots it never fills: views are meant to be
+    short lived, the columns are what stays in memory.
+    """
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: ItemStore, row: int) -> None:
+        ## no call to Item.__init__ : the row already exists in the store
+        self._store = store
+        self._row = row
+
+    @property
+    def price(self) -> float:
+        return float(self._store._price[self._row])
+
+    @property
+    def name(self) -> str:
+        return self._store.names[self._row]
+
+    @name.setter
+    def name(self, value: str) -> None:
+        if len(value) > 10:
+            raise Exception('The name is toooo long')
+        self._store.names[self._row] = value
+
+    @property
+    def quantity(self) -> int:
+        return int(self._store._quantity[self._row])
+
+    @quantity.setter
+    def quantity(self, value: int) -> None:
+        self._store._quantity[self._row] = value
+
+    @property
+    def broken_phones(self) -> int:
+        return int(self._store._broken[self._row])
+
+    @broken_phones.setter
+    def broken_phones(self, value: int) -> None:
+        self._store._broken[self._row] = value
+
+    def apply_discount(self) -> None:
+        self._store._price[self._row] *= Item.pay_rate
+
+    def apply_increment(self, increments_num: int) -> None:
+        self._store._price[self._row] *= 1 + increments_num
+
+    def _set_price(self, value: float) -> None:
+        self._store._price[self._row] = value
+
+    def calculate_total_price(self) -> float:
+        return self.price * self.quantity
+
+    def __repr__(self) -> str:
+        ## the view is not an instance of the row's class, so repr says both
+        kind = self._store.kind(self._row).__name__
+        return f"StoredItem[{kind}]('{self.name}', {self.price}, {self.quantity})"
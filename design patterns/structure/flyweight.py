@@ -21,11 +21,14 @@ The Flyweight pattern: stop storing extrinsic state inside the object.
 Only the intrinsic state stays within the object, letting you reuse it in different contexts.
 
     * Extrinsic state storage
+        (kept in columns next to a flyweight id, see PoliceCarDB)
     * Immutability 
         Since the same flyweight object can be used in different contexts,
         must have to make sure that its state can't be modified. 
     * Factory
         For more convenient access to various flyweights 
+        (can be bounded: capacity + LRU / LFU eviction, see FlyweightFactory,
+        or shared between threads, see ConcurrentFlyweightFactory)
 
 ## Applicability 
     - Use this when program must support a huge number of objects which barely fit into available RAM 
@@ -44,7 +47,13 @@ Only the intrinsic state stays within the object, letting you reuse it in differ
 """
 
 import json 
-from typing import Dict 
+import threading
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+## canonical key of a shared state: the sorted state as a tuple
+Key = Tuple[Hashable, ...]
 
 class Flyweight():
     """ 
@@ -62,47 +71,394 @@ class Flyweight():
         print(f"Flyweight: Displaying shared `{s}` and unique `{u}` state.", end="")
 
 
+def _check_capacity(capacity: Optional[int]) -> None:
+    if capacity is not None and capacity < 1:
+        raise ValueError(f"capacity must be None (unbounded) or at least 1, got {capacity}")
+
+
+class LRUCache():
+    """ keeps at most `capacity` entries, evicts the least recently used one """
+    def __init__(self, capacity: Optional[int] = None) -> None:
+        _check_capacity(capacity)
+        self.capacity = capacity
+        self._data: "OrderedDict[Key, Flyweight]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self):
+        return self._data.keys()
+
+    def get(self, key: Key) -> Optional[Flyweight]:
+        value = self._data.get(key)
+        if value is not None and self.capacity is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Key, value: Flyweight) -> List[Key]:
+        """ stores the entry and returns the keys evicted for it """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        evicted = []
+        while self.capacity is not None and len(self._data) > self.capacity:
+            evicted.append(self._data.popitem(last=False)[0])
+        return evicted
+
+
+class LFUCache():
+    """
+    keeps at most `capacity` entries, evicts the least frequently used one
+    (the least recently used among equals). every operation is O(1).
+    """
+    def __init__(self, capacity: int) -> None:
+        _check_capacity(capacity)
+        self.capacity = capacity
+        self._data: Dict[Key, Flyweight] = {}
+        self._counts: Dict[Key, int] = {}
+        ## use count -> keys with that count, oldest first
+        self._buckets: Dict[int, "OrderedDict[Key, None]"] = defaultdict(OrderedDict)
+        self._min_count = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self):
+        return self._data.keys()
+
+    def _touch(self, key: Key) -> None:
+        count = self._counts[key]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets[count + 1][key] = None
+
+    def get(self, key: Key) -> Optional[Flyweight]:
+        value = self._data.get(key)
+        if value is not None:
+            self._touch(key)
+        return value
+
+    def put(self, key: Key, value: Flyweight) -> List[Key]:
+        if key in self._data:
+            self._data[key] = value
+            self._touch(key)
+            return []
+
+        evicted = []
+        while self.capacity is not None and len(self._data) >= self.capacity:
+            victim, _ = self._buckets[self._min_count].popitem(last=False)
+            if not self._buckets[self._min_count]:
+                del self._buckets[self._min_count]
+            del self._data[victim]
+            del self._counts[victim]
+            evicted.append(victim)
+
+        self._data[key] = value
+        self._counts[key] = 1
+        self._buckets[1][key] = None
+        self._min_count = 1
+        return evicted
+
+
 class FlyweightFactory():
     """ 
     Flyweight Factory creates and manages the Flyweight objects
 
     It ensures that flyweights are shared correctly.
+
+    `capacity` bounds the number of flyweights kept, `policy` ('lru' or 'lfu')
+    picks which one is evicted. hits, misses and evictions are counted.
     """
 
-    _flyweights: Dict[str, Flyweight] = {}
+    POLICIES = {'lru': LRUCache, 'lfu': LFUCache}
+
+    def __init__(self, init_flyweights: Dict, capacity: Optional[int] = None,
+                 policy: str = 'lru') -> None:
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, use one of {sorted(self.POLICIES)}")
+        self._flyweights = self.POLICIES[policy](capacity)
+        ## one interned key object per cached state
+        self._keys: Dict[Key, Key] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-    def __init__(self, init_flyweights: Dict) -> None:
         for state in init_flyweights:
-            self._flyweights[self.get_key(state)] = Flyweight(state)
+            self._add(self.get_key(state), Flyweight(state))
     
-    def get_key(self, state: Dict) -> str:
-        """ returns a Flyweight;s string hash for a given state """
-        return "_".join(sorted(state))
+    def get_key(self, state: Dict) -> Key:
+        """
+        returns a Flyweight's key for a given state.
+        a tuple keeps the elements apart, so ["a_b", "c"] and ["a", "b_c"] differ,
+        and hashing it needs no new string.
+        """
+        return tuple(sorted(state))
 
-    def get_flyweight(self, shared_state: Dict) -> Flyweight:
+    def key_for(self, state: Dict) -> Key:
+        """
+        the key of a state, the interned one when the state is cached (keys are
+        only interned when a flyweight is stored, so asking never grows the table).
+        callers that look the same state up again and again can keep it
+        and pass it to `get_flyweight` to skip building the key.
+        """
+        key = self.get_key(state)
+        return self._keys.get(key, key)
+
+    def get_flyweight(self, shared_state: Dict, key: Optional[Key] = None) -> Flyweight:
         """ Returns an existing Flyweight with a given state or creates a new one. """
-        key = self.get_key(shared_state)
+        if key is None:
+            key = self.get_key(shared_state)
 
-        if not self._flyweights.get(key):
-            print("FlyweightFactory: can't find a flyweight, create new one.")
-            self._flyweights[key] = Flyweight(shared_state)
+        flyweight = self._flyweights.get(key)
+        if flyweight is None:
+            self.misses += 1
+            flyweight = Flyweight(shared_state)
+            self._add(key, flyweight)
         else:
-            print("FlyweightFactory: Reusing existing flyweight.")
+            self.hits += 1
+
+        return flyweight
 
-        return self._flyweights[key]
+    def _add(self, key: Key, flyweight: Flyweight) -> None:
+        key = self._keys.setdefault(key, key)
+        for evicted in self._flyweights.put(key, flyweight):
+            self._keys.pop(evicted, None)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._flyweights),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
     
     def list_flyweights(self) -> None:
         count = len(self._flyweights)
         print(f"FlyweightFactory: I have {count} flyweights.")
-        print("\n".join(map(str, self._flyweights.keys())), end="")
+        print("\n".join("_".join(map(str, key)) for key in self._flyweights.keys()), end="")
+
+class ConcurrentFlyweightFactory(FlyweightFactory):
+    """
+    FlyweightFactory that can be shared by many threads (e.g. a ThreadPoolExecutor's)
+    and still hands out one Flyweight per key.
+
+    lookups of existing keys take no lock: a single dict.get is atomic.
+    a miss takes one of `stripes` locks, picked by the key's hash, and checks
+    again before creating, so two threads never both create the same flyweight
+    while misses on other stripes go on in parallel.
+
+    unbounded: eviction would need a lock on every hit. `hits` is not locked
+    either and can undercount under contention, `misses` is exact.
+    """
+    def __init__(self, init_flyweights: Dict, stripes: int = 64) -> None:
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._flyweights: Dict[Key, Flyweight] = {}
+        self._keys: Dict[Key, Key] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        for state in init_flyweights:
+            self._add(self.get_key(state), Flyweight(state))
+
+    def get_flyweight(self, shared_state: Dict, key: Optional[Key] = None) -> Flyweight:
+        if key is None:
+            key = self.get_key(shared_state)
+
+        flyweight = self._flyweights.get(key)
+        if flyweight is not None:
+            self.hits += 1
+            return flyweight
+
+        with self._locks[hash(key) % len(self._locks)]:
+            flyweight = self._flyweights.get(key)
+            if flyweight is None:
+                self.misses += 1
+                flyweight = Flyweight(shared_state)
+                self._add(key, flyweight)
+            else:
+                self.hits += 1
+        return flyweight
+
+    def _add(self, key: Key, flyweight: Flyweight) -> None:
+        ## published only once complete: readers see no flyweight or this one
+        self._flyweights[self._keys.setdefault(key, key)] = flyweight
+
+
+class _StringColumn():
+    """ strings packed into one utf-8 buffer, plus the end offset of each """
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._ends = array('Q')
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def append(self, value: bytes) -> None:
+        """ `value` is already encoded, so nothing can fail half way through """
+        self._data += value
+        self._ends.append(len(self._data))
+
+    def raw(self, row: int) -> bytearray:
+        start = self._ends[row - 1] if row else 0
+        return self._data[start:self._ends[row]]
+
+    def __getitem__(self, row: int) -> str:
+        return self.raw(row).decode()
+
+
+CAR_FIELDS = ('plates', 'owner', 'brand', 'model', 'color')
+
+
+def _check_car(car: tuple) -> None:
+    """ a car row is five strings """
+    if len(car) != len(CAR_FIELDS):
+        raise ValueError(f"expected {', '.join(CAR_FIELDS)}, got {car!r}")
+    for field, value in zip(CAR_FIELDS, car):
+        if type(value) is not str:
+            raise TypeError(f"{field} must be a str, got {value!r}")
+
+
+class PoliceCarDB():
+    """
+    extrinsic state of every car, column by column:
+
+        plates, owners : _StringColumn
+        flyweight ids  : array('I'), an index into `flyweights`
+
+    `flyweights` keeps every flyweight a row points at, even after a bounded
+    factory has evicted it. plates are unique and found through an
+    open-addressing hash table of row numbers, so no str is kept per car.
+    """
+    def __init__(self, factory: FlyweightFactory) -> None:
+        self.factory = factory
+        self.flyweights: List[Flyweight] = []
+        self._flyweight_ids: Dict[Key, int] = {}
+        self._plates = _StringColumn()
+        self._owners = _StringColumn()
+        self._ids = array('I')
+        ## row per slot, -1 when empty, never more than 2/3 full
+        self._index = array('q', [-1]) * 8
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _flyweight_id(self, shared_state: List[str]) -> int:
+        key = self.factory.get_key(shared_state)
+        flyweight_id = self._flyweight_ids.get(key)
+        if flyweight_id is None:
+            flyweight_id = self._flyweight_ids[key] = len(self.flyweights)
+            self.flyweights.append(self.factory.get_flyweight(shared_state, key=key))
+        return flyweight_id
+
+    ## plate index
+    def _slot(self, plates: bytes) -> int:
+        """ the slot holding `plates`, or the empty slot where it would go """
+        mask = len(self._index) - 1
+        slot = hash(plates) & mask
+        while True:
+            row = self._index[slot]
+            if row == -1 or self._plates.raw(row) == plates:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _reserve(self, rows: int) -> None:
+        """ grows the index once so `rows` cars fit in it """
+        size = len(self._index)
+        while rows * 3 > size * 2:
+            size *= 2
+        if size == len(self._index):
+            return
+        self._index = array('q', [-1]) * size
+        for row in range(len(self._ids)):
+            self._index[self._slot(bytes(self._plates.raw(row)))] = row
+
+    ## writes
+    def add(self, plates: str, owner: str, brand: str, model: str, color: str) -> int:
+        """ stores one car and returns its row """
+        _check_car((plates, owner, brand, model, color))
+        self._reserve(len(self._ids) + 1)
+        return self._append(plates.encode(), owner.encode(), self._flyweight_id([brand, model, color]))
+
+    def extend(self, cars: Iterable[Tuple[str, str, str, str, str]]) -> int:
+        """
+        bulk insert of (plates, owner, brand, model, color) rows, returns how many.
+        all or nothing: every row is checked and encoded before any is stored.
+        """
+        cars = list(cars)
+        encoded = []
+        batch = set()
+        for car in cars:
+            if not (len(car) == 5 and all(type(value) is str for value in car)):
+                _check_car(car)     ## raises with the reason
+            plates, owner = car[0].encode(), car[1].encode()
+            if plates in batch or self._index[self._slot(plates)] != -1:
+                raise ValueError(f"plates {car[0]!r} are already registered")
+            batch.add(plates)
+            encoded.append((plates, owner))
+
+        self._reserve(len(self._ids) + len(cars))
+        ## shared state as given -> id, saves sorting it again for every car
+        seen: Dict[Tuple[str, str, str], int] = {}
+        for (plates, owner), (_, _, *shared_state) in zip(encoded, cars):
+            state = tuple(shared_state)
+            flyweight_id = seen.get(state)
+            if flyweight_id is None:
+                flyweight_id = seen[state] = self._flyweight_id(shared_state)
+            self._append(plates, owner, flyweight_id)
+        return len(cars)
+
+    def _append(self, plates: bytes, owner: bytes, flyweight_id: int) -> int:
+        """ every value is checked and encoded by now: the columns change together or not at all """
+        slot = self._slot(plates)
+        if self._index[slot] != -1:
+            raise ValueError(f"plates {plates.decode()!r} are already registered")
+        row = len(self._ids)
+        self._plates.append(plates)
+        self._owners.append(owner)
+        self._ids.append(flyweight_id)
+        self._index[slot] = row
+        return row
+
+    ## reads
+    def find(self, plates: str) -> Optional[int]:
+        """ the row of a car, by plates """
+        row = self._index[self._slot(plates.encode())]
+        return None if row == -1 else row
+
+    def car(self, row: int) -> Tuple[str, str, Flyweight]:
+        return self._plates[row], self._owners[row], self.flyweights[self._ids[row]]
+
+    def get(self, plates: str) -> Optional[Tuple[str, str, Flyweight]]:
+        row = self.find(plates)
+        return None if row is None else self.car(row)
+
+    def count_by_flyweight(self) -> Dict[Key, int]:
+        """ how many cars share each flyweight """
+        counts = Counter(self._ids)
+        return {key: counts[flyweight_id] for key, flyweight_id in self._flyweight_ids.items() if counts[flyweight_id]}
+
+    def count(self, brand: str, model: str, color: str) -> int:
+        flyweight_id = self._flyweight_ids.get(self.factory.get_key([brand, model, color]))
+        return 0 if flyweight_id is None else self._ids.count(flyweight_id)
+
 
 def add_car_to_police_db(
     factory: FlyweightFactory, plates: str, owner: str,
-    brand: str, model: str, color: str
+    brand: str, model: str, color: str, db: Optional[PoliceCarDB] = None
 ) -> None:
     print("\n\nClient: Adding a car to DB.")
     flyweight = factory.get_flyweight([brand, model, color])
     flyweight.operation([plates, owner])
+    if db is not None:
+        db.add(plates, owner, brand, model, color)
 
 if __name__ == "__main__":
     factory = FlyweightFactory([
@@ -115,9 +471,13 @@ if __name__ == "__main__":
 
     factory.list_flyweights()
 
-    add_car_to_police_db(factory, "CL234IR", "James Doe", "BMW", "M5", "red")
-    add_car_to_police_db(factory, "CL234IR", "James Doe", "BMW", "X1", "red")
+    db = PoliceCarDB(factory)
+    add_car_to_police_db(factory, "CL234IR", "James Doe", "BMW", "M5", "red", db)
+    add_car_to_police_db(factory, "CL235IR", "James Doe", "BMW", "X1", "red", db)
 
     print("\n")
 
-    factory.list_flyweights()
\ No newline at end of file
+    factory.list_flyweights()
+
+    print(f"\n\nFlyweightFactory: {factory.stats()}")
+    print(f"PoliceCarDB: {db.get('CL234IR')[:2]}, cars per flyweight {db.count_by_flyweight()}")
\ No newline at end of file
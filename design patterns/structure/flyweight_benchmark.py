@@ -0,0 +1,185 @@
+""" Flyweight factory benchmarks
+
+    python flyweight_benchmark.py [lookups|keys|cars|contention] [--states N] [--lookups N]
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from flyweight import ConcurrentFlyweightFactory, FlyweightFactory, PoliceCarDB
+
+
+def make_states(n: int) -> list:
+    return [[f"brand{i % 1000}", f"model{i}", f"color{i % 16}"] for i in range(n)]
+
+
+def lookups(args) -> None:
+    """ lookup throughput over `--states` distinct shared states, per capacity and policy """
+    states = make_states(args.states)
+    rnd = random.Random(0)
+    ## skewed access: a small hot set plus a long tail
+    hot = states[:max(1, len(states) // 100)]
+    workload = [rnd.choice(hot) if rnd.random() < 0.8 else rnd.choice(states)
+                for _ in range(args.lookups)]
+
+    for policy in ('lru', 'lfu'):
+        for capacity in (None, args.states // 10):
+            if policy == 'lfu' and capacity is None:
+                continue
+            factory = FlyweightFactory([], capacity=capacity, policy=policy)
+            start = time.perf_counter()
+            for state in workload:
+                factory.get_flyweight(state)
+            seconds = time.perf_counter() - start
+            stats = factory.stats()
+            print(f"{policy} capacity {str(capacity):>8}: {len(workload) / seconds:12,.0f} lookups/s, "
+                  f"hit rate {stats['hit_rate']:.1%}, {stats['evictions']:,} evictions, size {stats['size']:,}")
+
+
+def keys(args) -> None:
+    """ lookup cost of the old join-based key, the tuple key and a precomputed key """
+    states = make_states(args.states)
+    rnd = random.Random(0)
+    picks = [rnd.randrange(len(states)) for _ in range(args.lookups)]
+
+    factory = FlyweightFactory(states)
+    precomputed = [factory.key_for(state) for state in states]
+    joined = {"_".join(sorted(state)): None for state in states}
+    tupled = dict.fromkeys(precomputed)
+
+    ## the bare dict lookups isolate the key cost, the factory lines add its bookkeeping
+    cases = {
+        'join key': lambda i: joined.get("_".join(sorted(states[i]))),
+        'tuple key': lambda i: tupled.get(tuple(sorted(states[i]))),
+        'precomputed': lambda i: tupled.get(precomputed[i]),
+        'factory': lambda i: factory.get_flyweight(states[i]),
+        'factory, key=': lambda i: factory.get_flyweight(states[i], key=precomputed[i]),
+    }
+    for label, lookup in cases.items():
+        start = time.perf_counter()
+        for i in picks:
+            lookup(i)
+        seconds = time.perf_counter() - start
+        print(f"{label:>14}: {seconds / len(picks) * 1e9:8.0f} ns/lookup")
+
+    ## what a single lookup allocates for its key (sorted() list + key object)
+    state = states[0]
+    sorted_list = sys.getsizeof(sorted(state))
+    print(f"allocated per lookup: join {sorted_list + sys.getsizeof('_'.join(sorted(state)))} B, "
+          f"tuple {sorted_list + sys.getsizeof(tuple(sorted(state)))} B, precomputed 0 B")
+
+
+class _Car():
+    """ the baseline: one plain object per car, every field on it """
+    def __init__(self, plates: str, owner: str, brand: str, model: str, color: str) -> None:
+        self.plates = plates
+        self.owner = owner
+        self.brand = brand
+        self.model = model
+        self.color = color
+
+
+def iter_cars(n: int):
+    for i in range(n):
+        yield (f"CL{i:07d}", f"owner {i % 50_000}", f"brand{i % 100}", f"model{i % 1000}",
+               f"color{i % 16}")
+
+
+def _allocated(build) -> tuple:
+    ''' (result, bytes still allocated by `build`) '''
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def cars(args) -> None:
+    """ bytes per car and plate lookups: PoliceCarDB columns against one object per car """
+    n = args.states
+    rnd = random.Random(0)
+    picks = [f"CL{rnd.randrange(n):07d}" for _ in range(min(args.lookups, 200_000))]
+
+    ## both sides own every string they keep, the rows are generated as they go in
+    db, db_bytes = _allocated(lambda: _build_db(iter_cars(n)))
+    rows = list(iter_cars(n))
+    start = time.perf_counter()
+    _build_db(rows)
+    db_seconds = time.perf_counter() - start
+    del rows
+    objects, object_bytes = _allocated(
+        lambda: {plates: _Car(plates, *rest) for plates, *rest in iter_cars(n)})
+
+    print(f"PoliceCarDB : {db_bytes / n:6.1f} B/car, bulk insert {n / db_seconds:10,.0f} cars/s, "
+          f"{len(db.flyweights):,} flyweights")
+    print(f"plain object: {object_bytes / n:6.1f} B/car (dict by plates)")
+
+    for label, find in (('PoliceCarDB', db.find), ('plain object', objects.get)):
+        start = time.perf_counter()
+        for plates in picks:
+            find(plates)
+        seconds = time.perf_counter() - start
+        print(f"{label:>12}: {seconds / len(picks) * 1e9:8.0f} ns/plate lookup")
+
+    start = time.perf_counter()
+    db.count_by_flyweight()
+    print(f"count_by_flyweight: {time.perf_counter() - start:.3f}s")
+
+
+def _build_db(rows) -> PoliceCarDB:
+    db = PoliceCarDB(FlyweightFactory([]))
+    db.extend(rows)
+    return db
+
+
+def _lookup_all(factory: FlyweightFactory, workload: list) -> dict:
+    ''' key -> every distinct flyweight this thread got for it '''
+    seen = {}
+    for state in workload:
+        flyweight = factory.get_flyweight(state)
+        got = seen.setdefault(factory.get_key(state), [])
+        if flyweight not in got:
+            got.append(flyweight)
+    return seen
+
+
+def contention(args) -> None:
+    """ lookups/s with 1 to 32 threads racing to create the same flyweights """
+    states = make_states(min(args.states, 100_000))
+    for threads in (1, 2, 4, 8, 16, 32):
+        per_thread = args.lookups // threads
+        ## every thread walks the same states in the same order, so first lookups collide
+        workload = [states[i % len(states)] for i in range(per_thread)]
+        for factory in (FlyweightFactory([]), ConcurrentFlyweightFactory([])):
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                start = time.perf_counter()
+                results = list(pool.map(_lookup_all, [factory] * threads, [workload] * threads))
+                seconds = time.perf_counter() - start
+
+            instances = {}
+            for seen in results:
+                for key, flyweights in seen.items():
+                    instances.setdefault(key, set()).update(map(id, flyweights))
+            duplicates = sum(len(ids) - 1 for ids in instances.values())
+            print(f"{type(factory).__name__:>26} {threads:2} threads: "
+                  f"{per_thread * threads / seconds:12,.0f} lookups/s, {duplicates:,} duplicate flyweights")
+
+
+BENCHMARKS = {'lookups': lookups, 'keys': keys, 'cars': cars, 'contention': contention}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('name', nargs='?', default='lookups', choices=sorted(BENCHMARKS))
+    parser.add_argument('--states', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=2_000_000)
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    main()